@@ -0,0 +1,470 @@
+# Run with: python manage.py test api -p benchmarks.py
+import statistics
+import time
+import tracemalloc
+
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.pagination import Cursor
+from rest_framework.test import APIClient
+
+from app.models import (
+    FeedEntry,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    Tag
+)
+from users.models import Subscribe, User
+from .pagination import LimitCursorPagination
+from .search import search_ingredients
+from .shopping_list import RENDERERS, get_renderer
+from .tests import TEST_CACHES, clear_caches, recipe_relations
+
+
+def timed(func, runs=5):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def report(name, **values):
+    print(f'\n{name}: ' + ', '.join(
+        f'{key}={value:.2f}' if isinstance(value, float)
+        else f'{key}={value}'
+        for key, value in values.items()
+    ))
+
+
+def cart_rows(count):
+    return (
+        {
+            'ingredient__name': f'ингредиент {i}',
+            'ingredient__measurement_unit': 'г',
+            'amount': i,
+        }
+        for i in range(count)
+    )
+
+
+def drain(chunks):
+    return sum(len(chunk) for chunk in chunks)
+
+
+class ShoppingListRenderBenchmark(SimpleTestCase):
+    SIZES = (10, 100, 1000, 10000)
+
+    def test_pdf_growth(self):
+        renderer = get_renderer('pdf')
+        per_row = {}
+        for count in self.SIZES:
+            elapsed = timed(
+                lambda: drain(renderer.render(cart_rows(count))),
+                runs=3
+            )
+            tracemalloc.start()
+            size = drain(renderer.render(cart_rows(count)))
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            per_row[count] = elapsed / count
+            report(
+                'pdf shopping list',
+                ingredients=count,
+                ms=elapsed,
+                peak_kb=peak / 1024,
+                size_kb=size / 1024
+            )
+        self.assertLess(per_row[10000], per_row[1000] * 2)
+        self.assertLess(peak / 10000, 1024)
+
+    def test_format_throughput(self):
+        count = 10000
+        for format, renderer in RENDERERS.items():
+            size = drain(renderer.render(cart_rows(count)))
+            elapsed = timed(
+                lambda: drain(renderer.render(cart_rows(count))),
+                runs=3
+            )
+            report(
+                f'{format} shopping list',
+                ingredients=count,
+                rows_per_s=count / elapsed * 1000,
+                mb_per_s=size / elapsed * 1000 / 2 ** 20
+            )
+            if renderer.streaming:
+                self.assertGreater(count / elapsed * 1000, 50000)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ShoppingListDownloadBenchmark(TestCase):
+    RECIPES = 20
+    INGREDIENTS = 1000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='user@test.ru', username='user')
+        ingredients = Ingredient.objects.bulk_create([
+            Ingredient(name=f'ингредиент {i}', measurement_unit='г')
+            for i in range(cls.INGREDIENTS)
+        ])
+        recipes = Recipe.objects.bulk_create([
+            Recipe(author=cls.user, name=f'recipe{i}', text='text',
+                   cooking_time=1)
+            for i in range(cls.RECIPES)
+        ])
+        IngredientInRecipe.objects.bulk_create([
+            IngredientInRecipe(recipe=recipe, ingredient=ingredient, amount=1)
+            for recipe in recipes
+            for ingredient in ingredients
+        ])
+        ShoppingCart.objects.add_many(cls.user, [r.id for r in recipes])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def download(self, format):
+        clear_caches()
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/',
+            {'format': format}
+        )
+        self.assertEqual(response.status_code, 200)
+        return drain(response)
+
+    def test_formats(self):
+        for format in RENDERERS:
+            size = self.download(format)
+            elapsed = timed(lambda: self.download(format), runs=3)
+            report(
+                f'{format} download',
+                ingredients=self.INGREDIENTS,
+                rows=self.RECIPES * self.INGREDIENTS,
+                ms=elapsed,
+                size_kb=size / 1024
+            )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class IngredientSearchBenchmark(TestCase):
+    INGREDIENTS = 100000
+    WORDS = ('картофель', 'капуста', 'морковь', 'масло', 'сахар', 'соль')
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create([
+            Ingredient(
+                name=f'{cls.WORDS[i % len(cls.WORDS)]} {i}',
+                measurement_unit='г'
+            )
+            for i in range(cls.INGREDIENTS)
+        ], batch_size=5000)
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.search('warm up')
+
+    def search(self, value):
+        return list(search_ingredients(Ingredient.objects.all(), value))
+
+    def test_keystrokes(self):
+        for word in ('картофель 1', 'рков', 'нет такого'):
+            prefixes = [
+                word[:length] for length in range(1, len(word) + 1)
+            ]
+            search = [timed(lambda: self.search(value)) for value in prefixes]
+            request = [
+                timed(lambda: self.client.get(
+                    '/api/ingredients/',
+                    {'name': value}
+                ))
+                for value in prefixes
+            ]
+            report(
+                f'ingredient search "{word}"',
+                ingredients=self.INGREDIENTS,
+                search_max_ms=max(search),
+                request_median_ms=statistics.median(request)
+            )
+            self.assertLess(max(search), 5)
+
+
+@override_settings(CACHES=TEST_CACHES, FEED_FANOUT_LIMIT=200000)
+class FeedBenchmark(TestCase):
+    FOLLOWERS = 100000
+    TIMELINE = 1000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            email='author@test.ru',
+            username='author'
+        )
+        cls.followers = User.objects.bulk_create([
+            User(email=f'follower{i}@test.ru', username=f'follower{i}')
+            for i in range(cls.FOLLOWERS)
+        ], batch_size=5000)
+        Subscribe.objects.bulk_create([
+            Subscribe(user=follower, author=cls.author)
+            for follower in cls.followers
+        ], batch_size=5000)
+        recipes = Recipe.objects.bulk_create([
+            Recipe(author=cls.author, name=f'recipe{i}', text='text',
+                   cooking_time=1, fanned_out=True)
+            for i in range(cls.TIMELINE)
+        ])
+        cls.reader = cls.followers[0]
+        FeedEntry.objects.bulk_create([
+            FeedEntry(user=cls.reader, recipe=recipe) for recipe in recipes
+        ])
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def new_recipe(self):
+        return Recipe.objects.create(
+            author=self.author,
+            name='new',
+            text='text',
+            cooking_time=1
+        )
+
+    def test_fan_out(self):
+        recipe = self.new_recipe()
+        start = time.perf_counter()
+        pushed = FeedEntry.objects.fan_out(recipe)
+        elapsed = (time.perf_counter() - start) * 1000
+        report('fan-out', followers=pushed, ms=elapsed)
+        self.assertEqual(pushed, self.FOLLOWERS)
+
+    def test_pulled_author_skips_fan_out(self):
+        recipe = self.new_recipe()
+        with self.settings(FEED_FANOUT_LIMIT=10000):
+            elapsed = timed(lambda: FeedEntry.objects.fan_out(recipe))
+        first = self.client.get('/api/recipes/feed/').json()['results']
+        report('pulled post', followers=self.FOLLOWERS, ms=elapsed)
+        self.assertEqual(first[0]['id'], recipe.id)
+        self.assertLess(elapsed, 500)
+
+    def test_deep_page_latency(self):
+        first_url = deep = '/api/recipes/feed/?limit=10'
+        while True:
+            url = self.client.get(deep).json()['next']
+            if url is None:
+                break
+            deep = url
+        first = timed(lambda: self.client.get(first_url))
+        last = timed(lambda: self.client.get(deep))
+        report('feed page', first_ms=first, deep_ms=last)
+        self.assertLess(last, first * 3 + 10)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RecipePaginationBenchmark(TestCase):
+    RECIPES = 1000000
+    PAGE_SIZE = 100
+    DEEP_PAGE = 10000
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(email='author@test.ru', username='author')
+        for start in range(0, cls.RECIPES, 50000):
+            Recipe.objects.bulk_create([
+                Recipe(author=author, name=f'recipe{i}', text='text',
+                       cooking_time=1)
+                for i in range(start, start + 50000)
+            ], batch_size=5000)
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+
+    def get(self, url, **params):
+        params['limit'] = self.PAGE_SIZE
+        return lambda: self.client.get(url, params)
+
+    def test_deep_pages(self):
+        position = Recipe.objects.order_by('-id').values_list(
+            'id',
+            flat=True
+        )[(self.DEEP_PAGE - 1) * self.PAGE_SIZE - 1]
+        paginator = LimitCursorPagination()
+        paginator.base_url = f'/api/recipes/?limit={self.PAGE_SIZE}'
+        deep_cursor = paginator.encode_cursor(
+            Cursor(offset=0, reverse=False, position=str(position))
+        )
+        response = self.client.get(deep_cursor).json()
+        self.assertEqual(len(response['results']), self.PAGE_SIZE)
+        self.assertEqual(response['results'][0]['id'], position - 1)
+        timings = {
+            'page_first_ms': timed(self.get('/api/recipes/', page=1)),
+            'page_deep_ms': timed(
+                self.get('/api/recipes/', page=self.DEEP_PAGE)
+            ),
+            'cursor_first_ms': timed(self.get('/api/recipes/', cursor='')),
+            'cursor_deep_ms': timed(lambda: self.client.get(deep_cursor)),
+        }
+        report('recipe pages', recipes=self.RECIPES, **timings)
+        self.assertLess(
+            timings['cursor_deep_ms'],
+            timings['cursor_first_ms'] * 2 + 10
+        )
+
+
+def changed_rows(before, after):
+    before = {row[0]: row for row in before}
+    after = {row[0]: row for row in after}
+    return len(before.keys() ^ after.keys()) + sum(
+        before[pk] != after[pk] for pk in before.keys() & after.keys()
+    )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RecipeEditBenchmark(TestCase):
+    INGREDIENTS = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            email='user@test.ru',
+            username='user',
+            is_staff=True
+        )
+        cls.tags = [
+            Tag.objects.create(name=f'tag{i}', color=f'#00000{i}',
+                               slug=f'tag{i}')
+            for i in range(4)
+        ]
+        cls.ingredients = Ingredient.objects.bulk_create([
+            Ingredient(name=f'item{i}', measurement_unit='г')
+            for i in range(cls.INGREDIENTS + 5)
+        ])
+        cls.recipe = Recipe.objects.create(
+            author=cls.user,
+            name='recipe',
+            text='text',
+            cooking_time=1
+        )
+        cls.recipe.tags.set(cls.tags[:3])
+        IngredientInRecipe.objects.bulk_create([
+            IngredientInRecipe(recipe=cls.recipe, ingredient=ingredient,
+                               amount=1)
+            for ingredient in cls.ingredients[:cls.INGREDIENTS]
+        ])
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def ingredients_payload(self, changed=(), dropped=0, added=0):
+        items = [
+            {'id': ingredient.id, 'amount': 2 if number in changed else 1}
+            for number, ingredient in enumerate(
+                self.ingredients[dropped:self.INGREDIENTS + added]
+            )
+        ]
+        return {'ingredients': items}
+
+    def edit(self, payload):
+        with transaction.atomic():
+            before = recipe_relations(self.recipe)
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = self.client.patch(
+                    f'/api/recipes/{self.recipe.id}/',
+                    payload,
+                    format='json'
+                )
+                elapsed = (time.perf_counter() - start) * 1000
+            after = recipe_relations(self.recipe)
+            transaction.set_rollback(True)
+        self.assertEqual(response.status_code, 200)
+        writes = [
+            query for query in context.captured_queries
+            if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+        ]
+        rows = sum(map(changed_rows, before, after))
+        return elapsed, len(writes), rows
+
+    def test_typical_edits(self):
+        tag_ids = [tag.id for tag in self.tags]
+        edits = {
+            'name': {'name': 'renamed'},
+            'one amount': self.ingredients_payload(changed={0}),
+            'drop, change, add': self.ingredients_payload(
+                changed={1},
+                dropped=1,
+                added=1
+            ),
+            'swap a tag': {'tags': tag_ids[1:]},
+            'all amounts': self.ingredients_payload(
+                changed=range(self.INGREDIENTS)
+            ),
+        }
+        for name, payload in edits.items():
+            results = [self.edit(payload) for _ in range(5)]
+            _, writes, rows = results[0]
+            report(
+                f'recipe edit "{name}"',
+                through_rows=rows,
+                write_statements=writes,
+                ms=statistics.median(result[0] for result in results)
+            )
+            self.assertLessEqual(rows, self.INGREDIENTS)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RecipeSearchBenchmark(TestCase):
+    RECIPES = 1000000
+    WORDS = [f'слово{i}' for i in range(2000)]
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(email='author@test.ru', username='author')
+        words = cls.WORDS
+        for start in range(0, cls.RECIPES, 50000):
+            Recipe.objects.bulk_create([
+                Recipe(
+                    author=author,
+                    name=f'{words[i % 2000]} {words[i * 7 % 2000]}',
+                    text=f'{words[i * 13 % 2000]} {words[i * 31 % 2000]} суп',
+                    cooking_time=1
+                )
+                for i in range(start, start + 50000)
+            ], batch_size=5000)
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        start = time.perf_counter()
+        self.client.get('/api/recipes/', {'search': 'warm up'})
+        self.build = (time.perf_counter() - start) * 1000
+
+    def test_queries(self):
+        for value in ('слово5', 'слово5 слово35', 'суп', 'нет такого'):
+            start = time.perf_counter()
+            response = self.client.get('/api/recipes/', {'search': value})
+            first = (time.perf_counter() - start) * 1000
+            self.assertEqual(response.status_code, 200)
+            elapsed = timed(lambda: self.client.get(
+                '/api/recipes/',
+                {'search': value}
+            ))
+            report(
+                f'recipe search "{value}"',
+                recipes=self.RECIPES,
+                index_build_ms=self.build,
+                matches=response.json()['count'],
+                first_ms=first,
+                ms=elapsed
+            )
+            self.assertLess(elapsed, 100)
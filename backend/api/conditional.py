@@ -0,0 +1,55 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from . import versions
+
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name')
+
+
+def get_versions():
+    return versions.tags.get(), versions.ingredients.get()
+
+
+def make_digest(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def make_etag(*parts):
+    return f'W/{quote_etag(make_digest(*parts))}'
+
+
+def last_modified(*values):
+    timestamps = [
+        value if isinstance(value, int) else int(value.timestamp())
+        for value in values if value is not None
+    ]
+    return max(timestamps) if timestamps else None
+
+
+def recipe_version(recipe):
+    return (
+        recipe.pk,
+        recipe.updated,
+        *[getattr(recipe.author, field) for field in AUTHOR_FIELDS],
+    )
+
+
+def recipe_state(recipe):
+    return (
+        *recipe_version(recipe),
+        recipe.is_favorited,
+        recipe.is_in_shopping_cart,
+        recipe.author_is_subscribed,
+    )
+
+
+def conditional_response(request, etag, modified, respond):
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = respond()
+    response['ETag'] = etag
+    if modified is not None:
+        response['Last-Modified'] = http_date(modified)
+    return response
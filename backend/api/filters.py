@@ -0,0 +1,97 @@
+from django.db.models import Exists, F, OuterRef, Value
+from django.db.models.functions import Coalesce
+from rest_framework.filters import OrderingFilter
+from django_filters.rest_framework import (
+    BooleanFilter,
+    CharFilter,
+    FilterSet,
+    NumberFilter
+)
+
+from app.models import Favorite, Ingredient, Recipe, ShoppingCart
+from .search import search_ingredients, search_recipes
+
+
+class IngredientFilter(FilterSet):
+    name = CharFilter(method='filter_name')
+
+    class Meta:
+        model = Ingredient
+        fields = ('name',)
+
+    def filter_name(self, queryset, name, value):
+        return search_ingredients(queryset, value)
+
+
+class RecipeFilter(FilterSet):
+    author = NumberFilter(field_name='author_id')
+    tags = CharFilter(method='filter_tags')
+    is_favorited = BooleanFilter(method='filter_is_favorited')
+    is_in_shopping_cart = BooleanFilter(method='filter_is_in_shopping_cart')
+    search = CharFilter(method='filter_search')
+
+    class Meta:
+        model = Recipe
+        fields = (
+            'author',
+            'tags',
+            'is_favorited',
+            'is_in_shopping_cart',
+            'search',
+        )
+
+    def filter_tags(self, queryset, name, value):
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe_id=OuterRef('pk'),
+            tag__slug__in=self.data.getlist(name)
+        )))
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def filter_is_favorited(self, queryset, name, value):
+        return self.filter_user_relation(queryset, Favorite, value)
+
+    def filter_is_in_shopping_cart(self, queryset, name, value):
+        return self.filter_user_relation(queryset, ShoppingCart, value)
+
+    def filter_user_relation(self, queryset, model, value):
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset.none() if value else queryset
+        related = Exists(model.objects.filter(
+            user=user,
+            recipe_id=OuterRef('pk')
+        ))
+        return queryset.filter(related if value else ~related)
+
+
+class RecipeOrderingFilter(OrderingFilter):
+    search_param = 'search'
+    ranked_fields = {
+        'popular': 'popularity__popular',
+        'trending': 'popularity__trending',
+    }
+
+    def get_ordering(self, request, queryset, view):
+        if (
+            request.query_params.get(self.search_param)
+            and self.ordering_param not in request.query_params
+        ):
+            return None
+        ordering = list(super().get_ordering(request, queryset, view))
+        if not {'id', '-id'} & set(ordering):
+            ordering.append('-id')
+        return ordering
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view)
+        if not ordering:
+            return queryset
+        ranked = {field.lstrip('-') for field in ordering} & set(
+            self.ranked_fields
+        )
+        return queryset.annotate(**{
+            name: Coalesce(F(self.ranked_fields[name]), Value(0.0))
+            for name in ranked
+        }).order_by(*ordering)
@@ -0,0 +1,143 @@
+import heapq
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from app.models import IngredientInRecipe, RecipeChange
+
+CHANGE_RETENTION = timedelta(days=1)
+MAX_IDLE = CHANGE_RETENTION.total_seconds() / 2
+GAP_TIMEOUT = 60
+MAX_REPLAY = 1000
+
+
+def record_changes(recipe_ids):
+    RecipeChange.objects.bulk_create(
+        [RecipeChange(recipe_id=pk) for pk in set(recipe_ids)]
+    )
+    RecipeChange.objects.filter(
+        created__lt=timezone.now() - CHANGE_RETENTION
+    ).delete()
+
+
+class CoverageIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sequence = None
+        self.gaps = {}
+        self.refreshed = None
+        self.recipes = {}
+        self.postings = defaultdict(set)
+
+    def load(self, recipe_ids=None):
+        rows = IngredientInRecipe.objects.values_list(
+            'recipe_id',
+            'ingredient_id'
+        )
+        if recipe_ids is not None:
+            rows = rows.filter(recipe_id__in=recipe_ids)
+        ingredients = defaultdict(list)
+        for recipe_id, ingredient_id in rows.iterator():
+            ingredients[recipe_id].append(ingredient_id)
+        return ingredients
+
+    def rebuild(self):
+        self.sequence = RecipeChange.objects.aggregate(
+            sequence=Max('id')
+        )['sequence'] or 0
+        self.gaps = {}
+        self.recipes = {}
+        self.postings = defaultdict(set)
+        for recipe_id, ingredient_ids in self.load().items():
+            self.add(recipe_id, ingredient_ids)
+
+    def add(self, recipe_id, ingredient_ids):
+        self.recipes[recipe_id] = frozenset(ingredient_ids)
+        for ingredient_id in self.recipes[recipe_id]:
+            self.postings[ingredient_id].add(recipe_id)
+
+    def remove(self, recipe_id):
+        for ingredient_id in self.recipes.pop(recipe_id, ()):
+            self.postings[ingredient_id].discard(recipe_id)
+
+    def apply(self, recipe_ids):
+        ingredients = self.load(recipe_ids)
+        for recipe_id in recipe_ids:
+            self.remove(recipe_id)
+            if recipe_id in ingredients:
+                self.add(recipe_id, ingredients[recipe_id])
+
+    def get_changes(self, now):
+        rows = list(RecipeChange.objects.filter(
+            Q(id__gt=self.sequence) | Q(id__in=list(self.gaps))
+        ).order_by('id').values_list('id', 'recipe_id')[:MAX_REPLAY + 1])
+        if len(rows) > MAX_REPLAY:
+            return None
+        seen = set()
+        for pk, recipe_id in rows:
+            self.gaps.pop(pk, None)
+            seen.add(pk)
+        sequence = max([self.sequence, *seen])
+        missing = range(self.sequence + 1, sequence)
+        if len(missing) > MAX_REPLAY:
+            return None
+        for pk in missing:
+            if pk not in seen:
+                self.gaps[pk] = now
+        self.gaps = {
+            pk: found for pk, found in self.gaps.items()
+            if now - found < GAP_TIMEOUT
+        }
+        self.sequence = sequence
+        return {recipe_id for pk, recipe_id in rows}
+
+    def refresh(self):
+        now = time.monotonic()
+        changes = None
+        if self.refreshed is not None and now - self.refreshed < MAX_IDLE:
+            changes = self.get_changes(now)
+        if changes is None:
+            self.rebuild()
+        elif changes:
+            self.apply(changes)
+        self.refreshed = now
+
+    def match(self, ingredient_ids, candidates=None):
+        with self.lock:
+            self.refresh()
+            matched = Counter()
+            for ingredient_id in ingredient_ids:
+                postings = self.postings.get(ingredient_id, ())
+                if candidates is not None:
+                    postings = candidates.intersection(postings)
+                matched.update(postings)
+            return Matches({
+                recipe_id: (count / len(self.recipes[recipe_id]), count)
+                for recipe_id, count in matched.items()
+            })
+
+
+class Matches:
+    def __init__(self, scores):
+        self.scores = scores
+
+    def __len__(self):
+        return len(self.scores)
+
+    def __getitem__(self, index):
+        ranked = heapq.nlargest(
+            index.stop,
+            self.scores.items(),
+            key=lambda item: (*item[1], item[0])
+        )
+        return [
+            (recipe_id, coverage)
+            for recipe_id, (coverage, count) in ranked[index]
+        ]
+
+
+coverage_index = CoverageIndex()
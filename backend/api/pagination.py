@@ -0,0 +1,103 @@
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    Cursor,
+    CursorPagination,
+    PageNumberPagination
+)
+
+MAX_PAGE_SIZE = 100
+
+
+def get_recipes_limit(request):
+    try:
+        limit = int(request.query_params.get('recipes_limit'))
+    except (TypeError, ValueError):
+        return None
+    return limit if limit > 0 else None
+
+
+class LimitCursorPagination(CursorPagination):
+    ordering = '-id'
+    page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        backends = [
+            backend for backend in getattr(view, 'filter_backends', ())
+            if hasattr(backend, 'get_ordering')
+        ]
+        if backends:
+            ordering = backends[0]().get_ordering(request, queryset, view)
+            if isinstance(ordering, str):
+                return (ordering,)
+            if ordering:
+                return tuple(ordering)
+        return (self.ordering,)
+
+
+class FeedPagination(LimitCursorPagination):
+    def paginate_ids(self, request, get_ids):
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        before = None
+        if cursor is not None:
+            try:
+                before = int(cursor.position)
+            except (TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+        ids = get_ids(before, self.page_size + 1)
+        self.has_next = len(ids) > self.page_size
+        self.page = ids[:self.page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(
+            offset=0,
+            reverse=False,
+            position=self.page[-1]
+        ))
+
+    def get_previous_link(self):
+        return None
+
+
+class LimitPageNumberPagination(PageNumberPagination):
+    page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+
+
+class LimitPagination(LimitPageNumberPagination):
+    cursor_pagination_class = LimitCursorPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        cursor_query_param = self.cursor_pagination_class.cursor_query_param
+        if cursor_query_param in request.query_params:
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset,
+                request,
+                view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_state(self):
+        if self.cursor_paginator is not None:
+            return (
+                None,
+                self.cursor_paginator.get_next_link(),
+                self.cursor_paginator.get_previous_link(),
+            )
+        return (
+            self.page.paginator.count,
+            self.get_next_link(),
+            self.get_previous_link(),
+        )
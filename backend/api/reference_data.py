@@ -0,0 +1,53 @@
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.renderers import JSONRenderer
+
+from app.models import Ingredient, Tag
+from . import versions
+from .serializers import IngredientSerializer, TagSerializer
+
+
+class ReferenceData:
+    def __init__(self, version, queryset, serializer_class):
+        self.version = version
+        self.queryset = queryset
+        self.serializer_class = serializer_class
+        self.local = None
+
+    def get_version(self):
+        return self.version.get()
+
+    def bump(self):
+        self.version.bump()
+
+    def get(self):
+        version = self.get_version()
+        local = self.local
+        if local is None or local[0] != version:
+            data = self.serializer_class(self.queryset.all(), many=True).data
+            local = (version, JSONRenderer().render(data))
+            self.local = local
+        return local
+
+    def response(self, request):
+        (token, modified), content = self.get()
+        etag = quote_etag(token)
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=modified
+        )
+        if response is None:
+            response = HttpResponse(content, content_type='application/json')
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(modified)
+        return response
+
+
+tags = ReferenceData(versions.tags, Tag.objects.all(), TagSerializer)
+ingredients = ReferenceData(
+    versions.ingredients,
+    Ingredient.objects.all(),
+    IngredientSerializer
+)
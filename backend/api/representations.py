@@ -0,0 +1,55 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class RepresentationCache:
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.local = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_cache(self):
+        return caches[settings.RECIPE_REPRESENTATION_CACHE]
+
+    def make_key(self, key):
+        return f'{self.prefix}:{key}'
+
+    def get_many(self, keys):
+        found = {}
+        with self.lock:
+            for key in keys:
+                if key in self.local:
+                    self.local.move_to_end(key)
+                    found[key] = self.local[key]
+        missing = {
+            self.make_key(key): key for key in keys if key not in found
+        }
+        if missing:
+            shared = {
+                missing[key]: value
+                for key, value in self.get_cache().get_many(missing).items()
+            }
+            self.remember(shared)
+            found.update(shared)
+        return found
+
+    def set_many(self, items):
+        self.get_cache().set_many(
+            {self.make_key(key): value for key, value in items.items()},
+            settings.RECIPE_REPRESENTATION_TIMEOUT
+        )
+        self.remember(items)
+
+    def remember(self, items):
+        with self.lock:
+            for key, value in items.items():
+                self.local[key] = value
+                self.local.move_to_end(key)
+            while len(self.local) > settings.RECIPE_REPRESENTATION_LOCAL_SIZE:
+                self.local.popitem(last=False)
+
+
+recipes = RepresentationCache('recipe_representation')
@@ -0,0 +1,212 @@
+import heapq
+import re
+import uuid
+from bisect import bisect_left
+from collections import defaultdict
+from functools import lru_cache
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Value, When
+
+from app.models import Ingredient, IngredientInRecipe, Recipe
+from . import reference_data
+
+TOKEN = re.compile(r'\w+')
+RECIPE_INDEX_KEY = 'recipe_search:version'
+
+
+class IngredientIndex:
+    GRAM_SIZE = 3
+
+    def __init__(self, rows):
+        self.entries = sorted((name.lower(), pk) for pk, name in rows)
+        self.names = [name for name, _ in self.entries]
+        self.postings = defaultdict(list)
+        for position, name in enumerate(self.names):
+            for gram in {
+                name[start:start + size]
+                for size in range(1, self.GRAM_SIZE + 1)
+                for start in range(len(name) - size + 1)
+            }:
+                self.postings[gram].append(position)
+
+    def get_postings(self, value):
+        size = min(len(value), self.GRAM_SIZE)
+        return min(
+            (
+                self.postings.get(value[start:start + size], ())
+                for start in range(len(value) - size + 1)
+            ),
+            key=len
+        )
+
+    def search(self, value, limit):
+        value = value.lower()
+        prefix = []
+        position = bisect_left(self.names, value)
+        while (
+            position < len(self.entries)
+            and len(prefix) < limit
+            and self.names[position].startswith(value)
+        ):
+            prefix.append(self.entries[position][1])
+            position += 1
+        substring = []
+        for position in self.get_postings(value):
+            if len(prefix) + len(substring) >= limit:
+                break
+            name = self.names[position]
+            if value in name and not name.startswith(value):
+                substring.append(self.entries[position][1])
+        return prefix, substring
+
+
+@lru_cache(maxsize=1)
+def get_ingredient_index(version):
+    return IngredientIndex(Ingredient.objects.values_list('pk', 'name'))
+
+
+def search_ingredients(queryset, value, limit=None):
+    limit = limit or settings.INGREDIENT_SEARCH_LIMIT
+    if connection.vendor == 'postgresql':
+        prefix = queryset.filter(name__istartswith=value).annotate(
+            rank=Value(0, output_field=IntegerField())
+        ).order_by('name')[:limit]
+        substring = queryset.filter(name__icontains=value).exclude(
+            name__istartswith=value
+        ).annotate(
+            rank=Value(1, output_field=IntegerField())
+        ).order_by('name')[:limit]
+        return prefix.union(substring, all=True).order_by(
+            'rank', 'name'
+        )[:limit]
+    prefix, substring = get_ingredient_index(
+        reference_data.ingredients.get_version()
+    ).search(value, limit)
+    return queryset.filter(pk__in=prefix + substring).order_by(Case(
+        When(pk__in=prefix, then=Value(0)),
+        default=Value(1),
+        output_field=IntegerField()
+    ), 'name')
+
+
+def tokenize(value):
+    return TOKEN.findall(value.lower())
+
+
+class RecipeIndex:
+    NAME_WEIGHT = 4
+    INGREDIENT_WEIGHT = 2
+    TEXT_WEIGHT = 1
+
+    def __init__(self, recipes, ingredients):
+        self.postings = defaultdict(lambda: defaultdict(int))
+        self.ranked = {}
+        for pk, name, text in recipes:
+            self.add(pk, name, self.NAME_WEIGHT)
+            self.add(pk, text, self.TEXT_WEIGHT)
+        for pk, name in ingredients:
+            self.add(pk, name, self.INGREDIENT_WEIGHT)
+
+    def add(self, pk, value, weight):
+        for term in tokenize(value):
+            self.postings[term][pk] += weight
+
+    def get_ranked(self, term):
+        ranked = self.ranked.get(term)
+        if ranked is None and term in self.postings:
+            postings = self.postings[term]
+            ranked = self.ranked[term] = sorted(
+                postings,
+                key=lambda pk: (postings[pk], pk),
+                reverse=True
+            )
+        return ranked or ()
+
+    def search(self, value, limit, candidates=None):
+        terms = tokenize(value)
+        if not terms:
+            return []
+        if len(set(terms)) == 1:
+            postings = self.postings.get(terms[0], {})
+            matches = (
+                (pk, postings[pk] * len(terms))
+                for pk in self.get_ranked(terms[0])
+                if candidates is None or pk in candidates
+            )
+            return list(islice(matches, limit))
+        first, *rest = sorted(
+            (self.postings.get(term, {}) for term in terms),
+            key=len
+        )
+        scores = (
+            (pk, score + sum(postings[pk] for postings in rest))
+            for pk, score in first.items()
+            if all(pk in postings for postings in rest)
+            and (candidates is None or pk in candidates)
+        )
+        return heapq.nlargest(limit, scores, key=lambda item: item[::-1])
+
+
+def get_index_cache():
+    return caches[settings.SEARCH_INDEX_CACHE]
+
+
+def get_recipe_index_version():
+    cache = get_index_cache()
+    version = cache.get(RECIPE_INDEX_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.add(RECIPE_INDEX_KEY, version, None)
+        version = cache.get(RECIPE_INDEX_KEY, version)
+    return version
+
+
+def bump_recipe_index():
+    get_index_cache().set(RECIPE_INDEX_KEY, uuid.uuid4().hex, None)
+
+
+@lru_cache(maxsize=1)
+def get_recipe_index(version):
+    return RecipeIndex(
+        Recipe.objects.values_list('pk', 'name', 'text').iterator(),
+        IngredientInRecipe.objects.values_list(
+            'recipe_id',
+            'ingredient__name'
+        ).iterator()
+    )
+
+
+def search_recipes(queryset, value):
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(
+            value,
+            search_type='websearch',
+            config=settings.RECIPE_SEARCH_CONFIG
+        )
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', '-id')
+    candidates = None
+    if queryset.query.has_filters():
+        candidates = set(queryset.values_list('pk', flat=True))
+    matches = get_recipe_index(get_recipe_index_version()).search(
+        value,
+        settings.RECIPE_SEARCH_LIMIT,
+        candidates
+    )
+    ranks = defaultdict(list)
+    for pk, score in matches:
+        ranks[score].append(pk)
+    return queryset.filter(pk__in=[pk for pk, _ in matches]).annotate(
+        search_rank=Case(
+            *[When(pk__in=pks, then=Value(score))
+              for score, pks in ranks.items()],
+            default=Value(0),
+            output_field=IntegerField()
+        )
+    ).order_by('-search_rank', '-id')
@@ -1,27 +1,91 @@
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files import File
 from django.db import transaction
-from django.db.models import F
+from django.db.models import Manager, prefetch_related_objects
 from djoser.serializers import UserSerializer
 
 from rest_framework.exceptions import ValidationError
-from rest_framework.fields import IntegerField, SerializerMethodField
+from rest_framework.fields import (
+    Field,
+    IntegerField,
+    ListField,
+    SerializerMethodField
+)
 from rest_framework.relations import PrimaryKeyRelatedField
-from rest_framework.serializers import ImageField, ModelSerializer
-
-from app.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from rest_framework.serializers import (
+    ImageField,
+    ListSerializer,
+    ModelSerializer,
+    Serializer
+)
+
+from app.models import (
+    MAX_AMOUNT,
+    FeedEntry,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    Tag
+)
+from app.images import schedule_renditions
 from users.models import Subscribe, User
+from . import representations
+from .conditional import get_versions, make_digest, recipe_version
+from .pagination import MAX_PAGE_SIZE, get_recipes_limit
 
 import base64
+import binascii
+import tempfile
+
+DECODE_CHUNK_SIZE = 64 * 1024
 
 
 class Base64ImageField(ImageField):
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
+            format, _, imgstr = data.partition(';base64,')
+            if len(imgstr) * 3 // 4 > settings.IMAGE_MAX_UPLOAD_SIZE:
+                raise ValidationError(
+                    'ERR: The image must not exceed '
+                    f'{settings.IMAGE_MAX_UPLOAD_SIZE} bytes'
+                )
             ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            data = File(self.decode(imgstr), name='temp.' + ext)
         return super().to_internal_value(data)
 
+    def decode(self, imgstr):
+        stream = tempfile.SpooledTemporaryFile(
+            max_size=DECODE_CHUNK_SIZE * 16
+        )
+        try:
+            for start in range(0, len(imgstr), DECODE_CHUNK_SIZE):
+                stream.write(base64.b64decode(
+                    imgstr[start:start + DECODE_CHUNK_SIZE],
+                    validate=True
+                ))
+        except (binascii.Error, ValueError):
+            stream.close()
+            raise ValidationError('ERR: Invalid base64 image')
+        stream.seek(0)
+        return stream
+
+
+class RenditionField(Field):
+    def __init__(self, rendition, **kwargs):
+        self.rendition = rendition
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, obj):
+        image = getattr(obj, self.rendition) or obj.image
+        if not image:
+            return None
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(image.url)
+        return image.url
+
 
 class CustomUserSerializer(UserSerializer):
 
@@ -39,6 +103,8 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context.get('request').user
         if not user.is_anonymous:
             return Subscribe.objects.filter(user=user, author=obj).exists()
@@ -66,10 +132,17 @@ class SubscribeSerializer(CustomUserSerializer):
         return data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.recipes.count()
 
     def get_recipes(self, obj):
-        recipes = obj.recipes.all()
+        recipes = getattr(obj, 'limited_recipes', None)
+        if recipes is None:
+            recipes = obj.recipes.all()
+            limit = get_recipes_limit(self.context.get('request'))
+            if limit:
+                recipes = recipes[:limit]
         serializer = RecipeLessSerializer(recipes, many=True, read_only=True)
         return serializer.data
 
@@ -94,16 +167,25 @@ class TagSerializer(ModelSerializer):
         fields = '__all__'
 
 
+class RecipeListSerializer(ListSerializer):
+    def to_representation(self, data):
+        if isinstance(data, Manager):
+            data = data.all()
+        return self.child.represent_many(list(data))
+
+
 class RecipeReadSerializer(ModelSerializer):
     tags = TagSerializer(many=True, read_only=True)
     author = CustomUserSerializer(read_only=True)
     ingredients = SerializerMethodField()
     image = Base64ImageField(required=False, allow_null=True)
+    card_image = RenditionField('card_image')
     is_favorited = SerializerMethodField(read_only=True)
     is_in_shopping_cart = SerializerMethodField(read_only=True)
 
     class Meta:
         model = Recipe
+        list_serializer_class = RecipeListSerializer
         fields = (
             'id',
             'tags',
@@ -113,26 +195,88 @@ class RecipeReadSerializer(ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'card_image',
             'text',
             'cooking_time',
         )
 
-    def get_ingredients(self, obj):
-        ingredients = obj.ingredients.values(
-            'id',
-            'name',
-            'measurement_unit',
-            amount=F('ingredientinrecipe__amount')
+    def to_representation(self, instance):
+        return self.represent_many([instance])[0]
+
+    def represent_many(self, recipes):
+        request = self.context.get('request')
+        host = request.build_absolute_uri('/') if request else ''
+        versions = get_versions()
+        prefetch_related_objects(recipes, 'author')
+        keys = {
+            recipe.pk: f'{recipe.pk}:' + make_digest(
+                recipe_version(recipe),
+                versions,
+                host
+            )
+            for recipe in recipes
+        }
+        found = representations.recipes.get_many(list(keys.values()))
+        missing = [
+            recipe for recipe in recipes if keys[recipe.pk] not in found
+        ]
+        if missing:
+            prefetch_related_objects(
+                missing,
+                *Recipe.objects.related_lookups()
+            )
+            rendered = {}
+            for recipe in missing:
+                recipe.author.is_subscribed = False
+                rendered[keys[recipe.pk]] = super().to_representation(recipe)
+            representations.recipes.set_many(rendered)
+            found.update(rendered)
+        return [
+            self.overlay(found[keys[recipe.pk]], recipe) for recipe in recipes
+        ]
+
+    def overlay(self, data, recipe):
+        data = dict(data)
+        data['author'] = dict(
+            data['author'],
+            is_subscribed=self.get_author_is_subscribed(recipe)
         )
-        return ingredients
+        data['is_favorited'] = self.get_is_favorited(recipe)
+        data['is_in_shopping_cart'] = self.get_is_in_shopping_cart(recipe)
+        return data
+
+    def get_author_is_subscribed(self, obj):
+        if hasattr(obj, 'author_is_subscribed'):
+            return obj.author_is_subscribed
+        user = self.context.get('request').user
+        if user.is_anonymous:
+            return False
+        return Subscribe.objects.filter(
+            user=user,
+            author_id=obj.author_id
+        ).exists()
+
+    def get_ingredients(self, obj):
+        return [
+            {
+                'id': item.ingredient.id,
+                'name': item.ingredient.name,
+                'measurement_unit': item.ingredient.measurement_unit,
+                'amount': item.amount,
+            } for item in obj.ingredients_list.all()
+        ]
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
         return user.favorites.filter(recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
@@ -162,9 +306,27 @@ class RecipeWriteSerializer(ModelSerializer):
 
         if not ingredients:
             raise ValidationError('ERR: Need to add an ingredient')
-        if len(ingredients) != len(tuple(ingredients)):
-            raise ValidationError('ERR: The ingredient is already in use')
-        return ingredients
+
+        amounts = {}
+        for item in ingredients:
+            amounts[item['id']] = amounts.get(item['id'], 0) + item['amount']
+
+        missing = amounts.keys() - set(Ingredient.objects.filter(
+            id__in=amounts
+        ).values_list('id', flat=True))
+        if missing:
+            raise ValidationError(
+                f'ERR: Unknown ingredients {sorted(missing)}'
+            )
+        if max(amounts.values()) > MAX_AMOUNT:
+            raise ValidationError(
+                f'ERR: The amount must not exceed {MAX_AMOUNT}'
+            )
+
+        return [
+            {'id': ingredient_id, 'amount': amount}
+            for ingredient_id, amount in amounts.items()
+        ]
 
     def validate_tags(self, tags):
 
@@ -194,30 +356,91 @@ class RecipeWriteSerializer(ModelSerializer):
             recipe=recipe,
             ingredients=ingredients
         )
+        schedule_renditions(recipe.id)
+        transaction.on_commit(lambda: FeedEntry.objects.fan_out(recipe))
         return recipe
 
+    def update_ingredients_in_recipe(self, ingredients, recipe):
+        current = {
+            item.ingredient_id: item
+            for item in recipe.ingredients_list.all()
+        }
+        amounts = {item['id']: item['amount'] for item in ingredients}
+
+        removed = current.keys() - amounts.keys()
+        if removed:
+            IngredientInRecipe.objects.filter(
+                recipe=recipe,
+                ingredient_id__in=removed
+            ).delete()
+
+        changed = []
+        for ingredient_id, item in current.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and item.amount != amount:
+                item.amount = amount
+                changed.append(item)
+        if changed:
+            IngredientInRecipe.objects.bulk_update(changed, ['amount'])
+
+        added = [
+            {'id': ingredient_id, 'amount': amount}
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in current
+        ]
+        if added:
+            self.create_ingredients_in_recipe(added, recipe)
+
     @transaction.atomic
     def update(self, instance, data):
-        tags = data.pop('tags')
-        ingredients = data.pop('ingredients')
+        tags = data.pop('tags', None)
+        ingredients = data.pop('ingredients', None)
+        image = instance.image.name
         instance = super().update(instance, data)
-        instance.tags.clear()
-        instance.tags.set(tags)
-        instance.ingredients.clear()
-        self.create_ingredients_in_recipe(
-            recipe=instance,
-            ingredients=ingredients
-        )
-        instance.save()
+        if instance.image.name != image:
+            Recipe.objects.filter(pk=instance.pk).update(
+                thumbnail=None,
+                card_image=None
+            )
+            schedule_renditions(instance.id)
+        if tags is not None:
+            instance.tags.set(tags)
+        if ingredients is not None:
+            self.update_ingredients_in_recipe(ingredients, instance)
         return instance
 
     def to_representation(self, instance):
         request = self.context.get('request')
         context = {'request': request}
+        instance = Recipe.objects.for_read(request.user).get(pk=instance.pk)
         return RecipeReadSerializer(instance, context=context).data
 
 
 class RecipeLessSerializer(ModelSerializer):
+    thumbnail = RenditionField('thumbnail')
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'thumbnail', 'cooking_time')
+
+
+class IdListSerializer(Serializer):
+    ids = ListField(
+        child=IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_PAGE_SIZE
+    )
+
+    def validate_ids(self, ids):
+        return list(dict.fromkeys(ids))
+
+
+class IngredientMatchSerializer(Serializer):
+    ingredients = ListField(
+        child=IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_PAGE_SIZE
+    )
+
+    def validate_ingredients(self, ingredients):
+        return list(dict.fromkeys(ingredients))
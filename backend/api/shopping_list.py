@@ -0,0 +1,260 @@
+import csv
+import hashlib
+import itertools
+import json
+import logging
+import tempfile
+import uuid
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Sum
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFError, TTFont
+from reportlab.pdfgen import canvas
+
+from app.models import IngredientInRecipe, ShoppingCart
+
+FONT_NAME = 'DejaVuSerif'
+FONT_FILE = 'DejaVuSerif.ttf'
+FALLBACK_FONT_NAME = 'Helvetica'
+FONT_SIZE = 10
+LEADING = 14
+MARGIN = 40
+CHUNK_SIZE = 64 * 1024
+
+GENERATION_KEY = 'shopping_list:generation'
+DIGEST_KEY = 'shopping_list:{generation}:digest:{user_id}'
+DOCUMENT_KEY = 'shopping_list:document:{format}:{digest}'
+
+DEFAULT_FORMAT = 'pdf'
+RENDERERS = {}
+
+logger = logging.getLogger(__name__)
+
+
+def register_fonts():
+    try:
+        pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_FILE))
+    except TTFError:
+        logger.warning(
+            'Font %s not found, shopping lists will use %s',
+            FONT_FILE,
+            FALLBACK_FONT_NAME
+        )
+
+
+def get_font_name():
+    if FONT_NAME in pdfmetrics.getRegisteredFontNames():
+        return FONT_NAME
+    return FALLBACK_FONT_NAME
+
+
+def cart_ingredients(user):
+    return IngredientInRecipe.objects.filter(
+        recipe__shopping_cart__user=user
+    ).values(
+        'ingredient__name',
+        'ingredient__measurement_unit'
+    ).annotate(amount=Sum('amount')).order_by('ingredient__name')
+
+
+def iter_cart_rows(user):
+    return cart_ingredients(user).iterator()
+
+
+def format_line(row):
+    return (
+        f'{row["ingredient__name"]} '
+        f'({row["ingredient__measurement_unit"]}) - '
+        f'{row["amount"]}'
+    )
+
+
+def register_renderer(renderer_class):
+    RENDERERS[renderer_class.format] = renderer_class()
+    return renderer_class
+
+
+def get_renderer(format):
+    return RENDERERS.get(format or DEFAULT_FORMAT)
+
+
+class ShoppingListRenderer:
+    format = None
+    content_type = None
+    streaming = True
+
+    @property
+    def filename(self):
+        return f'shopping_cart.{self.format}'
+
+    def render(self, rows):
+        raise NotImplementedError
+
+
+@register_renderer
+class PdfRenderer(ShoppingListRenderer):
+    format = 'pdf'
+    content_type = 'application/pdf'
+    streaming = False
+
+    def render(self, rows):
+        with tempfile.TemporaryFile() as stream:
+            self.write(rows, stream)
+            stream.seek(0)
+            yield from iter(partial(stream.read, CHUNK_SIZE), b'')
+
+    def write(self, rows, stream):
+        width, height = A4
+        lines_per_page = int((height - 2 * MARGIN) // LEADING)
+        font_name = get_font_name()
+        pdf = canvas.Canvas(stream, pagesize=A4)
+        text = None
+        for number, row in enumerate(rows):
+            if number % lines_per_page == 0:
+                if text is not None:
+                    pdf.drawText(text)
+                    pdf.showPage()
+                text = pdf.beginText(MARGIN, height - MARGIN)
+                text.setFont(font_name, FONT_SIZE, LEADING)
+            text.textLine(format_line(row))
+        if text is not None:
+            pdf.drawText(text)
+        pdf.showPage()
+        pdf.save()
+
+
+@register_renderer
+class TextRenderer(ShoppingListRenderer):
+    format = 'txt'
+    content_type = 'text/plain; charset=utf-8'
+
+    def render(self, rows):
+        for row in rows:
+            yield f'{format_line(row)}\n'.encode()
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+@register_renderer
+class CsvRenderer(ShoppingListRenderer):
+    format = 'csv'
+    content_type = 'text/csv; charset=utf-8'
+
+    def render(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(
+            ('name', 'measurement_unit', 'amount')
+        ).encode()
+        for row in rows:
+            yield writer.writerow((
+                row['ingredient__name'],
+                row['ingredient__measurement_unit'],
+                row['amount'],
+            )).encode()
+
+
+@register_renderer
+class JsonRenderer(ShoppingListRenderer):
+    format = 'json'
+    content_type = 'application/json'
+
+    def render(self, rows):
+        yield b'['
+        for number, row in enumerate(rows):
+            item = json.dumps({
+                'name': row['ingredient__name'],
+                'measurement_unit': row['ingredient__measurement_unit'],
+                'amount': row['amount'],
+            }, ensure_ascii=False)
+            yield f'{"," if number else ""}{item}'.encode()
+        yield b']'
+
+
+def get_cache():
+    return caches[settings.SHOPPING_LIST_CACHE]
+
+
+def get_generation(cache):
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        generation = uuid.uuid4().hex
+        cache.add(GENERATION_KEY, generation, None)
+        generation = cache.get(GENERATION_KEY, generation)
+    return generation
+
+
+def get_digest_key(cache, user_id):
+    return DIGEST_KEY.format(
+        generation=get_generation(cache),
+        user_id=user_id
+    )
+
+
+def rows_digest(rows):
+    digest = hashlib.sha256()
+    for row in rows:
+        digest.update(json.dumps((
+            row['ingredient__name'],
+            row['ingredient__measurement_unit'],
+            row['amount'],
+        )).encode())
+    return digest.hexdigest()
+
+
+def get_cart_digest(user):
+    cache = get_cache()
+    key = get_digest_key(cache, user.id)
+    digest = cache.get(key)
+    if digest is not None:
+        return digest, None
+    rows = list(cart_ingredients(user))
+    digest = rows_digest(rows)
+    cache.set(key, digest, settings.SHOPPING_LIST_CACHE_TIMEOUT)
+    return digest, rows
+
+
+def get_document(renderer, user, digest, rows=None):
+    cache = get_cache()
+    key = DOCUMENT_KEY.format(format=renderer.format, digest=digest)
+    document = cache.get(key)
+    if document is not None:
+        return document
+    if rows is None:
+        rows = iter_cart_rows(user)
+    chunks = iter(renderer.render(rows))
+    head = []
+    size = 0
+    for chunk in chunks:
+        head.append(chunk)
+        size += len(chunk)
+        if size > settings.SHOPPING_LIST_CACHE_MAX_SIZE:
+            return itertools.chain(head, chunks)
+    document = b''.join(head)
+    cache.set(key, document, settings.SHOPPING_LIST_CACHE_TIMEOUT)
+    return document
+
+
+def invalidate_users(user_ids):
+    cache = get_cache()
+    generation = get_generation(cache)
+    cache.delete_many([
+        DIGEST_KEY.format(generation=generation, user_id=pk)
+        for pk in user_ids
+    ])
+
+
+def invalidate_recipe(recipe_id):
+    invalidate_users(set(ShoppingCart.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('user_id', flat=True)))
+
+
+def invalidate_all():
+    get_cache().set(GENERATION_KEY, uuid.uuid4().hex, None)
@@ -0,0 +1,71 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from app.models import (
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    Tag,
+    user_recipes_changed
+)
+from . import reference_data
+from .matching import record_changes
+from .search import bump_recipe_index
+from .shopping_list import invalidate_all, invalidate_recipe, invalidate_users
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def invalidate_cart(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_users([instance.user_id]))
+
+
+@receiver(user_recipes_changed, sender=ShoppingCart)
+def invalidate_cart_batch(sender, user_id, **kwargs):
+    transaction.on_commit(lambda: invalidate_users([user_id]))
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+def invalidate_ingredient_in_recipe(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_recipe(instance.recipe_id))
+    transaction.on_commit(bump_recipe_index)
+    transaction.on_commit(lambda: record_changes([instance.recipe_id]))
+
+
+@receiver(post_save, sender=Recipe)
+def invalidate_recipe_carts(sender, instance, created, **kwargs):
+    if not created:
+        transaction.on_commit(lambda: invalidate_recipe(instance.pk))
+    transaction.on_commit(bump_recipe_index)
+    transaction.on_commit(lambda: record_changes([instance.pk]))
+
+
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_search(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(bump_recipe_index)
+    transaction.on_commit(lambda: record_changes([pk]))
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_recipe_ingredients(sender, instance, action, **kwargs):
+    if action.startswith('post_') and isinstance(instance, Recipe):
+        transaction.on_commit(lambda: invalidate_recipe(instance.pk))
+        transaction.on_commit(lambda: record_changes([instance.pk]))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_all)
+    transaction.on_commit(reference_data.ingredients.bump)
+    transaction.on_commit(bump_recipe_index)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tag(sender, instance, **kwargs):
+    transaction.on_commit(reference_data.tags.bump)
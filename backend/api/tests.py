@@ -0,0 +1,847 @@
+import threading
+from unittest import skipIf, skipUnless
+
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from app.models import (
+    Favorite,
+    FeedEntry,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    RecipeChange,
+    ShoppingCart,
+    Tag
+)
+from users.models import Subscribe, User
+from .filters import RecipeFilter
+from .matching import coverage_index
+
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tests',
+    },
+    'files': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tests-files',
+    },
+}
+
+
+def clear_caches():
+    for cache in caches.all():
+        cache.clear()
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RecipeListQueriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='user@test.ru', username='user')
+        author = User.objects.create(email='author@test.ru', username='author')
+        Subscribe.objects.create(user=cls.user, author=author)
+        tags = [
+            Tag.objects.create(
+                name=f'tag{i}',
+                color=f'#00000{i}',
+                slug=f'tag{i}'
+            )
+            for i in range(2)
+        ]
+        ingredients = [
+            Ingredient.objects.create(name=f'item{i}', measurement_unit='г')
+            for i in range(3)
+        ]
+        for i in range(20):
+            recipe = Recipe.objects.create(
+                author=author,
+                name=f'recipe{i}',
+                text='text',
+                cooking_time=1
+            )
+            recipe.tags.set(tags)
+            IngredientInRecipe.objects.bulk_create([
+                IngredientInRecipe(
+                    recipe=recipe,
+                    ingredient=ingredient,
+                    amount=i + 1
+                )
+                for ingredient in ingredients
+            ])
+            if i % 2:
+                Favorite.objects.add(cls.user, recipe)
+            if i % 3:
+                ShoppingCart.objects.add(cls.user, recipe)
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_list(self, limit):
+        response = self.client.get('/api/recipes/', {'limit': limit})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), limit)
+        return response
+
+    def test_list_queries_do_not_depend_on_page_size(self):
+        for limit in (1, 5, 20):
+            clear_caches()
+            with self.subTest(limit=limit), self.assertNumQueries(4):
+                self.get_list(limit)
+
+    def test_cached_list_skips_prefetches(self):
+        self.get_list(20)
+        with self.assertNumQueries(2):
+            self.get_list(20)
+
+    def test_detail_queries(self):
+        recipe = Recipe.objects.create(
+            author=self.user,
+            name='own',
+            text='text',
+            cooking_time=1
+        )
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/api/recipes/{recipe.id}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_reads_user_flags_from_annotations(self):
+        for item in self.get_list(20).data['results']:
+            number = int(item['name'][len('recipe'):])
+            self.assertEqual(item['is_favorited'], bool(number % 2))
+            self.assertEqual(item['is_in_shopping_cart'], bool(number % 3))
+            self.assertTrue(item['author']['is_subscribed'])
+            self.assertEqual(len(item['tags']), 2)
+            self.assertEqual(len(item['ingredients']), 3)
+
+
+# A successful add or remove also updates the recipe counter.
+TOGGLE_QUERIES = {
+    ('post', 201): 3,
+    ('post', 400): 2,
+    ('delete', 204): 2,
+    ('delete', 400): 2,
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class UserRecipeToggleTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='user@test.ru', username='user')
+        cls.recipe = Recipe.objects.create(
+            author=cls.user,
+            name='recipe',
+            text='text',
+            cooking_time=1
+        )
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_toggle_statuses(self):
+        for action, field in (
+            ('favorite', 'favorites_count'),
+            ('shopping_cart', 'in_carts_count'),
+        ):
+            url = f'/api/recipes/{self.recipe.id}/{action}/'
+            for method, status, count in (
+                ('post', 201, 1),
+                ('post', 400, 1),
+                ('delete', 204, 0),
+                ('delete', 400, 0),
+            ):
+                with self.subTest(action=action, method=method, status=status):
+                    with CaptureQueriesContext(connection) as context:
+                        response = getattr(self.client, method)(url)
+                    self.assertEqual(response.status_code, status)
+                    self.assertEqual(
+                        len(context),
+                        TOGGLE_QUERIES[method, status]
+                    )
+                    self.recipe.refresh_from_db()
+                    self.assertEqual(getattr(self.recipe, field), count)
+
+    def test_missing_recipe(self):
+        for method in ('post', 'delete'):
+            with self.subTest(method=method):
+                response = getattr(self.client, method)(
+                    '/api/recipes/0/favorite/'
+                )
+                self.assertEqual(response.status_code, 404)
+
+    def test_affected_rows(self):
+        other = Recipe.objects.create(
+            author=self.user,
+            name='other',
+            text='text',
+            cooking_time=1
+        )
+        ids = {self.recipe.id, other.id}
+        self.assertEqual(Favorite.objects.add_many(self.user, ids), ids)
+        self.assertEqual(
+            Favorite.objects.add_many(self.user, [self.recipe.id]),
+            set()
+        )
+        self.assertEqual(
+            Favorite.objects.remove_many(self.user, [self.recipe.id, 0]),
+            {self.recipe.id}
+        )
+        self.assertEqual(
+            Favorite.objects.remove_many(self.user, [self.recipe.id]),
+            set()
+        )
+        self.assertEqual(
+            list(Recipe.objects.order_by('id').values_list(
+                'favorites_count',
+                flat=True
+            )),
+            [0, 1]
+        )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class UserRecipeConcurrencyTest(TransactionTestCase):
+    threads = 8
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('Shared-cache SQLite locks whole tables')
+        clear_caches()
+        self.user = User.objects.create(email='user@test.ru', username='user')
+        self.recipe = Recipe.objects.create(
+            author=self.user,
+            name='recipe',
+            text='text',
+            cooking_time=1
+        )
+        self.url = f'/api/recipes/{self.recipe.id}/favorite/'
+
+    def call(self, method, barrier, results):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        try:
+            barrier.wait()
+            with CaptureQueriesContext(connection) as context:
+                response = getattr(client, method)(self.url)
+            results.append((response.status_code, len(context)))
+        except Exception:
+            results.append((500, None))
+        finally:
+            connection.close()
+
+    def run_concurrently(self, method):
+        barrier = threading.Barrier(self.threads)
+        results = []
+        threads = [
+            threading.Thread(target=self.call, args=(method, barrier, results))
+            for _ in range(self.threads)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for status, queries in results:
+            self.assertNotEqual(status, 500)
+            self.assertEqual(queries, TOGGLE_QUERIES[method, status])
+        return sorted(status for status, queries in results)
+
+    def test_concurrent_toggle(self):
+        self.assertEqual(
+            self.run_concurrently('post'),
+            [201] + [400] * (self.threads - 1)
+        )
+        self.assertEqual(
+            self.run_concurrently('delete'),
+            [204] + [400] * (self.threads - 1)
+        )
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 0)
+        self.assertFalse(Favorite.objects.exists())
+
+
+class RecipeChangeTest(TestCase):
+    def test_delete_in_transaction_records_change(self):
+        user = User.objects.create(email='user@test.ru', username='user')
+        recipe = Recipe.objects.create(
+            author=user,
+            name='recipe',
+            text='text',
+            cooking_time=1
+        )
+        pk = recipe.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                recipe.delete()
+        self.assertTrue(RecipeChange.objects.filter(recipe_id=pk).exists())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class WhatCanICookTest(TestCase):
+    url = '/api/recipes/what_can_i_cook/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='user@test.ru', username='user')
+        cls.tag = Tag.objects.create(
+            name='breakfast',
+            color='#000000',
+            slug='breakfast'
+        )
+        cls.salt, cls.eggs = Ingredient.objects.bulk_create([
+            Ingredient(name='salt', measurement_unit='г'),
+            Ingredient(name='eggs', measurement_unit='шт'),
+        ])
+        recipes = Recipe.objects.bulk_create([
+            Recipe(author=cls.user, name=f'salt{i}', text='text',
+                   cooking_time=1)
+            for i in range(150)
+        ])
+        cls.omelette = Recipe.objects.create(
+            author=cls.user,
+            name='omelette',
+            text='text',
+            cooking_time=1
+        )
+        cls.omelette.tags.add(cls.tag)
+        IngredientInRecipe.objects.bulk_create([
+            IngredientInRecipe(recipe=recipe, ingredient=cls.salt, amount=1)
+            for recipe in recipes
+        ] + [
+            IngredientInRecipe(
+                recipe=cls.omelette,
+                ingredient=ingredient,
+                amount=1
+            )
+            for ingredient in (cls.salt, cls.eggs)
+        ])
+
+    def setUp(self):
+        clear_caches()
+        coverage_index.refreshed = None
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, **params):
+        return self.client.get(
+            self.url,
+            {'ingredients': self.salt.id, **params}
+        )
+
+    def test_filters_apply_before_ranking(self):
+        response = self.get(tags='breakfast')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['name'], 'omelette')
+        self.assertEqual(response.data['results'][0]['coverage'], 0.5)
+
+    def test_all_matches_are_paginated(self):
+        response = self.get(limit=100, page=2)
+        self.assertEqual(response.data['count'], 151)
+        self.assertEqual(len(response.data['results']), 51)
+        self.assertEqual(response.data['results'][-1]['name'], 'omelette')
+
+    def test_invalid_ingredients(self):
+        for params in ({}, {'ingredients': 'x'}):
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('ingredients', response.data)
+
+
+@override_settings(CACHES=TEST_CACHES, FEED_BACKFILL_SIZE=2)
+class SubscriptionFeedTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='user@test.ru', username='user')
+        cls.authors = User.objects.bulk_create([
+            User(email=f'author{i}@test.ru', username=f'author{i}')
+            for i in range(20)
+        ])
+        Recipe.objects.bulk_create([
+            Recipe(author=author, name=f'recipe{i}', text='text',
+                   cooking_time=1, fanned_out=True)
+            for author in cls.authors[:3]
+            for i in range(5)
+        ])
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.ids = [author.id for author in self.authors]
+
+    def test_backfill_is_limited_per_author(self):
+        self.client.post(
+            '/api/users/subscribe/',
+            {'ids': self.ids},
+            format='json'
+        )
+        self.assertEqual(FeedEntry.objects.filter(user=self.user).count(), 6)
+
+    def test_unsubscribe_queries_do_not_depend_on_authors(self):
+        for ids in (self.ids[:2], self.ids):
+            self.client.post('/api/users/subscribe/', {'ids': ids},
+                             format='json')
+            with self.subTest(authors=len(ids)), self.assertNumQueries(3):
+                self.client.delete('/api/users/subscribe/', {'ids': ids},
+                                   format='json')
+            self.assertFalse(FeedEntry.objects.filter(user=self.user))
+
+    def test_single_unsubscribe_cleans_feed(self):
+        url = f'/api/users/{self.authors[0].id}/subscribe/'
+        self.client.post(url)
+        self.assertEqual(FeedEntry.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertFalse(FeedEntry.objects.filter(user=self.user))
+
+    def test_feed_pages_merge_pulled_authors(self):
+        pulled = Recipe.objects.bulk_create([
+            Recipe(author=self.authors[3], name=f'pulled{i}', text='text',
+                   cooking_time=1)
+            for i in range(3)
+        ])
+        self.client.post(
+            '/api/users/subscribe/',
+            {'ids': self.ids[:4]},
+            format='json'
+        )
+        expected = sorted(
+            [recipe.id for recipe in pulled] + list(
+                FeedEntry.objects.filter(user=self.user).values_list(
+                    'recipe_id',
+                    flat=True
+                )
+            ),
+            reverse=True
+        )
+        ids = []
+        url = '/api/recipes/feed/?limit=4'
+        while url:
+            response = self.client.get(url).json()
+            ids += [recipe['id'] for recipe in response['results']]
+            url = response['next']
+        self.assertEqual(ids, expected)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/recipes/feed/', {'cursor': 'x'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_trim_keeps_newest_entries(self):
+        self.client.post(
+            '/api/users/subscribe/',
+            {'ids': self.ids},
+            format='json'
+        )
+        newest = list(FeedEntry.objects.filter(user=self.user).order_by(
+            '-recipe_id'
+        ).values_list('recipe_id', flat=True)[:4])
+        self.assertEqual(FeedEntry.objects.trim(4), 2)
+        self.assertEqual(
+            list(FeedEntry.objects.filter(user=self.user).order_by(
+                '-recipe_id'
+            ).values_list('recipe_id', flat=True)),
+            newest
+        )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RecipeETagTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='user@test.ru', username='user')
+        cls.other = User.objects.create(email='other@test.ru', username='o')
+        cls.tag = Tag.objects.create(name='tag', color='#000000', slug='tag')
+        cls.ingredient = Ingredient.objects.create(
+            name='item',
+            measurement_unit='г'
+        )
+        cls.recipes = []
+        for i in range(2):
+            recipe = Recipe.objects.create(
+                author=cls.user,
+                name=f'recipe{i}',
+                text='text',
+                cooking_time=1
+            )
+            recipe.tags.add(cls.tag)
+            IngredientInRecipe.objects.create(
+                recipe=recipe,
+                ingredient=cls.ingredient,
+                amount=1
+            )
+            cls.recipes.append(recipe)
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.urls = (f'/api/recipes/{self.recipes[0].id}/', '/api/recipes/')
+
+    def get(self, url, etag=None):
+        if etag is None:
+            return self.client.get(url)
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def rename_tag(self):
+        self.tag.name = 'renamed'
+        self.tag.save()
+
+    def rename_ingredient(self):
+        self.ingredient.name = 'renamed'
+        self.ingredient.save()
+
+    def edit_amount(self):
+        item = IngredientInRecipe.objects.get(recipe=self.recipes[0])
+        item.amount = 5
+        item.save()
+
+    def toggle_favorite(self):
+        self.client.post(f'/api/recipes/{self.recipes[0].id}/favorite/')
+
+    def test_not_modified(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    self.get(url, response['ETag']).status_code,
+                    304
+                )
+
+    def test_changes_invalidate_etag(self):
+        for change in (
+            self.rename_tag,
+            self.rename_ingredient,
+            self.edit_amount,
+            self.toggle_favorite,
+        ):
+            etags = [self.get(url)['ETag'] for url in self.urls]
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+            for url, etag in zip(self.urls, etags):
+                with self.subTest(change=change.__name__, url=url):
+                    self.assertEqual(self.get(url, etag).status_code, 200)
+
+    def test_reorder_changes_list_etag(self):
+        url = '/api/recipes/?ordering=-favorites_count'
+        response = self.get(url)
+        self.assertEqual(
+            [item['id'] for item in response.data['results']],
+            [self.recipes[1].id, self.recipes[0].id]
+        )
+        Favorite.objects.add(self.other, self.recipes[0])
+        response = self.get(url, response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item['id'] for item in response.data['results']],
+            [self.recipes[0].id, self.recipes[1].id]
+        )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RecipeRepresentationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='user@test.ru', username='user')
+        cls.tag = Tag.objects.create(name='tag', color='#000000', slug='tag')
+        cls.ingredient = Ingredient.objects.create(
+            name='item',
+            measurement_unit='г'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.user,
+            name='recipe',
+            text='text',
+            cooking_time=1
+        )
+        cls.recipe.tags.add(cls.tag)
+        IngredientInRecipe.objects.create(
+            recipe=cls.recipe,
+            ingredient=cls.ingredient,
+            amount=1
+        )
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def read(self):
+        return [
+            self.client.get(f'/api/recipes/{self.recipe.id}/').data,
+            self.client.get('/api/recipes/').data['results'][0],
+        ]
+
+    def rename(self, instance, field):
+        setattr(instance, field, 'renamed')
+        with self.captureOnCommitCallbacks(execute=True):
+            instance.save()
+
+    def test_renames_are_reflected(self):
+        for instance, field, get_value in (
+            (self.user, 'username', lambda data: data['author']['username']),
+            (self.tag, 'name', lambda data: data['tags'][0]['name']),
+            (
+                self.ingredient,
+                'name',
+                lambda data: data['ingredients'][0]['name']
+            ),
+        ):
+            with self.subTest(model=type(instance).__name__):
+                self.read()
+                self.rename(instance, field)
+                self.assertEqual(
+                    [get_value(data) for data in self.read()],
+                    ['renamed', 'renamed']
+                )
+
+
+def recipe_relations(recipe):
+    return (
+        list(IngredientInRecipe.objects.filter(recipe=recipe).order_by(
+            'id'
+        ).values_list('id', 'ingredient_id', 'amount')),
+        list(Recipe.tags.through.objects.filter(recipe=recipe).order_by(
+            'id'
+        ).values_list('id', 'tag_id')),
+    )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RecipeUpdateTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            email='user@test.ru',
+            username='user',
+            is_staff=True
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.user,
+            name='recipe',
+            text='text',
+            cooking_time=1
+        )
+        cls.recipe.tags.set([
+            Tag.objects.create(name=f'tag{i}', color=f'#00000{i}',
+                               slug=f'tag{i}')
+            for i in range(2)
+        ])
+        IngredientInRecipe.objects.bulk_create([
+            IngredientInRecipe(
+                recipe=cls.recipe,
+                ingredient=Ingredient.objects.create(
+                    name=f'item{i}',
+                    measurement_unit='г'
+                ),
+                amount=i + 1
+            )
+            for i in range(3)
+        ])
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_name_only_patch_keeps_relations(self):
+        relations = recipe_relations(self.recipe)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(
+                f'/api/recipes/{self.recipe.id}/',
+                {'name': 'renamed'},
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['name'], 'renamed')
+        self.assertEqual(recipe_relations(self.recipe), relations)
+        self.assertEqual([
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+            and (
+                '"app_ingredientinrecipe"' in query['sql']
+                or '"app_recipe_tags"' in query['sql']
+            )
+        ], [])
+
+
+@override_settings(CACHES=TEST_CACHES, INGREDIENT_SEARCH_LIMIT=3)
+class IngredientSearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create([
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('сыр', 'сыроежки', 'творожный сыр', 'сырок', 'Мёд')
+        ])
+
+    def setUp(self):
+        clear_caches()
+
+    def search(self, value):
+        response = APIClient().get('/api/ingredients/', {'name': value})
+        return [item['name'] for item in response.json()]
+
+    def test_prefix_matches_come_first(self):
+        self.assertEqual(
+            self.search('сЫр'),
+            ['сыр', 'сыроежки', 'сырок']
+        )
+        self.assertEqual(self.search('ЁД'), ['Мёд'])
+        self.assertEqual(self.search('жный'), ['творожный сыр'])
+        self.assertEqual(self.search('ок'), ['сырок'])
+        self.assertEqual(self.search('абв'), [])
+
+
+@skipIf(connection.vendor == 'postgresql', 'Ranked by ts_rank')
+@override_settings(CACHES=TEST_CACHES)
+class RecipeSearchIndexTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(email='author@test.ru', username='a')
+        beet = Ingredient.objects.create(name='свекла', measurement_unit='г')
+        cls.tag = Tag.objects.create(name='tag', color='#000000', slug='tag')
+        for name, text, ingredient, tagged in (
+            ('суп', 'добавить свекла', None, True),
+            ('винегрет', 'text', beet, True),
+            ('свекла запеченная', 'text', None, False),
+            ('свекла', 'свекла', None, False),
+            ('свекла тертая', 'text', None, False),
+            ('салат', 'text', None, False),
+        ):
+            recipe = Recipe.objects.create(author=author, name=name,
+                                           text=text, cooking_time=1)
+            if ingredient:
+                IngredientInRecipe.objects.create(
+                    recipe=recipe,
+                    ingredient=ingredient,
+                    amount=1
+                )
+            if tagged:
+                recipe.tags.add(cls.tag)
+
+    def setUp(self):
+        clear_caches()
+
+    def search(self, **params):
+        response = APIClient().get('/api/recipes/', params)
+        return [recipe['name'] for recipe in response.json()['results']]
+
+    def test_fields_are_weighted(self):
+        self.assertEqual(self.search(search='Свекла'), [
+            'свекла',
+            'свекла тертая',
+            'свекла запеченная',
+            'винегрет',
+            'суп',
+        ])
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.search(search='свекла суп'), ['суп'])
+        self.assertEqual(self.search(search='свекла щи'), [])
+
+    def test_filters_apply_before_limit(self):
+        with self.settings(RECIPE_SEARCH_LIMIT=2):
+            self.assertEqual(
+                self.search(search='свекла'),
+                ['свекла', 'свекла тертая']
+            )
+            self.assertEqual(
+                self.search(search='свекла', tags='tag'),
+                ['винегрет', 'суп']
+            )
+
+
+class RecipeFilterMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='user@test.ru', username='user')
+        cls.tags = [
+            Tag.objects.create(
+                name=f'tag{i}',
+                color=f'#00000{i}',
+                slug=f'tag{i}'
+            )
+            for i in range(2)
+        ]
+        cls.recipes = Recipe.objects.bulk_create([
+            Recipe(author=cls.user, name=f'recipe{i}', text='text',
+                   cooking_time=1)
+            for i in range(200)
+        ])
+        for recipe in cls.recipes[:2]:
+            recipe.tags.set(cls.tags)
+        Favorite.objects.add_many(cls.user, [cls.recipes[0].id])
+        ShoppingCart.objects.add_many(cls.user, [cls.recipes[1].id])
+
+    def filter(self, **params):
+        request = RequestFactory().get('/api/recipes/', params)
+        request.user = self.user
+        return RecipeFilter(
+            request.GET,
+            queryset=Recipe.objects.all(),
+            request=request
+        ).qs
+
+
+class RecipeFilterTest(RecipeFilterMixin, TestCase):
+    def test_tags_do_not_duplicate_rows(self):
+        self.assertCountEqual(
+            self.filter(tags=['tag0', 'tag1']),
+            self.recipes[:2]
+        )
+
+    def test_user_relations(self):
+        self.assertEqual(list(self.filter(is_favorited=1)), self.recipes[:1])
+        self.assertEqual(
+            list(self.filter(is_in_shopping_cart=1)),
+            self.recipes[1:2]
+        )
+        self.assertEqual(self.filter(is_favorited=0).count(), 199)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'PostgreSQL query plans')
+class RecipeFilterPlanTest(RecipeFilterMixin, TestCase):
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET enable_seqscan = off')
+
+    def tearDown(self):
+        with connection.cursor() as cursor:
+            cursor.execute('RESET enable_seqscan')
+
+    def assertIndexed(self, queryset, table):
+        plan = queryset.explain()
+        self.assertIn(f' on {table}', plan)
+        self.assertNotIn(f'Seq Scan on {table}', plan)
+
+    def test_author_plan(self):
+        self.assertIndexed(self.filter(author=self.user.id), 'app_recipe')
+
+    def test_tags_plan(self):
+        self.assertIndexed(
+            self.filter(tags=['tag0', 'tag1']),
+            'app_recipe_tags'
+        )
+
+    def test_is_favorited_plan(self):
+        self.assertIndexed(self.filter(is_favorited=1), 'app_favorite')
+
+    def test_is_in_shopping_cart_plan(self):
+        self.assertIndexed(
+            self.filter(is_in_shopping_cart=1),
+            'app_shoppingcart'
+        )
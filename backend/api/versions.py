@@ -0,0 +1,33 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+VERSION_KEY = 'reference_data:{name}:version'
+
+
+class Version:
+    def __init__(self, name):
+        self.key = VERSION_KEY.format(name=name)
+
+    def get_cache(self):
+        return caches[settings.REFERENCE_DATA_CACHE]
+
+    def get(self):
+        cache = self.get_cache()
+        version = cache.get(self.key)
+        if version is None:
+            cache.add(self.key, self.new(), None)
+            version = cache.get(self.key)
+        return version
+
+    def new(self):
+        return uuid.uuid4().hex, int(time.time())
+
+    def bump(self):
+        self.get_cache().set(self.key, self.new(), None)
+
+
+tags = Version('tags')
+ingredients = Version('ingredients')
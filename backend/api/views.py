@@ -1,5 +1,9 @@
+import heapq
+from functools import partial
+
 from app.models import (
-    Recipe, Tag, Ingredient, IngredientInRecipe, Favorite, ShoppingCart
+    Recipe, Tag, Ingredient, Favorite, ShoppingCart, FeedEntry,
+    RecipeNeighbor
 )
 from users.models import User, Subscribe
 from .serializers import (
@@ -8,14 +12,51 @@ from .serializers import (
     RecipeLessSerializer,
     TagSerializer,
     IngredientSerializer,
-    SubscribeSerializer
+    SubscribeSerializer,
+    IdListSerializer,
+    IngredientMatchSerializer
 )
 from .permissions import IsAdminOrReadOnly, IsAuthorOrReadOnly
+from .filters import IngredientFilter, RecipeFilter, RecipeOrderingFilter
+from . import reference_data
+from .negotiation import IgnoreFormatContentNegotiation
+from .conditional import (
+    AUTHOR_FIELDS,
+    conditional_response,
+    get_versions,
+    last_modified,
+    make_etag,
+    recipe_state
+)
+from .matching import coverage_index
+from .pagination import (
+    FeedPagination,
+    LimitPageNumberPagination,
+    get_recipes_limit
+)
+from .shopping_list import (
+    get_cart_digest,
+    get_document,
+    get_renderer,
+    iter_cart_rows
+)
 
 from djoser.views import UserViewSet
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.conf import settings
+from django.db.models import (
+    Case,
+    Count,
+    Exists,
+    IntegerField,
+    OuterRef,
+    Prefetch,
+    Value,
+    When
+)
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
 
 from rest_framework.response import Response
@@ -24,28 +65,123 @@ from rest_framework.decorators import action
 from rest_framework import status
 from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
 
-from reportlab.pdfgen import canvas
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+
+def batch_results(ids, changed, found, success_status, error, errors=None):
+    errors = errors or {}
+    results = []
+    for pk in ids:
+        if pk in changed:
+            results.append({'id': pk, 'status': success_status})
+        elif pk in found:
+            results.append({
+                'id': pk,
+                'status': status.HTTP_400_BAD_REQUEST,
+                'detail': errors.get(pk, error),
+            })
+        else:
+            results.append({
+                'id': pk,
+                'status': status.HTTP_404_NOT_FOUND,
+                'detail': 'ERR: Not found',
+            })
+    return Response(results)
 
 
 class IngredientViewSet(ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (IsAdminOrReadOnly,)
+    pagination_class = None
+    filter_backends = (DjangoFilterBackend,)
+    filterset_class = IngredientFilter
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params:
+            return super().list(request, *args, **kwargs)
+        return reference_data.ingredients.response(request)
 
 
 class TagViewSet(ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAdminOrReadOnly,)
+    pagination_class = None
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params:
+            return super().list(request, *args, **kwargs)
+        return reference_data.tags.response(request)
 
 
 class RecipeViewSet(ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = (IsAuthorOrReadOnly, IsAdminOrReadOnly)
-    filter_backends = (DjangoFilterBackend,)
-    filterset_fields = ('tags',)
+    filter_backends = (DjangoFilterBackend, RecipeOrderingFilter)
+    filterset_class = RecipeFilter
+    ordering_fields = (
+        'id',
+        'favorites_count',
+        'in_carts_count',
+        'popular',
+        'trending',
+    )
+    ordering = ('-id',)
+    lookup_value_regex = r'\d+'
+
+    def get_queryset(self):
+        if self.request.method in SAFE_METHODS:
+            return Recipe.objects.for_read(self.request.user)
+        return Recipe.objects.all()
+
+    def retrieve(self, request, *args, **kwargs):
+        state = Recipe.objects.with_user_flags(request.user).filter(
+            pk=self.kwargs[self.lookup_field]
+        ).values_list(
+            'author_id',
+            'updated',
+            *[f'author__{field}' for field in AUTHOR_FIELDS],
+            'is_favorited',
+            'is_in_shopping_cart',
+            'author_is_subscribed'
+        ).first()
+        if state is None:
+            return super().retrieve(request, *args, **kwargs)
+        self.check_object_permissions(request, Recipe(
+            pk=self.kwargs[self.lookup_field],
+            author=User(pk=state[0])
+        ))
+        versions = get_versions()
+        return conditional_response(
+            request,
+            make_etag(state, versions),
+            last_modified(state[1], *[version[1] for version in versions]),
+            lambda: super(RecipeViewSet, self).retrieve(
+                request,
+                *args,
+                **kwargs
+            )
+        )
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        versions = get_versions()
+        return conditional_response(
+            request,
+            make_etag(
+                request.get_full_path(),
+                self.paginator.get_state(),
+                [recipe_state(recipe) for recipe in page],
+                versions
+            ),
+            last_modified(
+                *[recipe.updated for recipe in page],
+                *[version[1] for version in versions]
+            ),
+            lambda: self.get_paginated_response(
+                self.get_serializer(page, many=True).data
+            )
+        )
 
     @action(
         methods=['post'],
@@ -77,12 +213,14 @@ class RecipeViewSet(ModelViewSet):
         return self.add_del(ShoppingCart, request, pk)
 
     def add_del(self, model, request, pk):
-        obj = model.objects.filter(user=request.user, recipe__id=pk)
-        recipe = get_object_or_404(Recipe, id=pk)
-
         if request.method == 'POST':
-            if not obj.exists():
-                model.objects.create(user=request.user, recipe=recipe)
+            recipe = get_object_or_404(
+                Recipe.objects.only(
+                    'id', 'name', 'image', 'thumbnail', 'cooking_time'
+                ),
+                id=pk
+            )
+            if model.objects.add(request.user, recipe):
                 serializer = RecipeLessSerializer(recipe)
                 return Response(
                     serializer.data,
@@ -93,49 +231,185 @@ class RecipeViewSet(ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        if obj.exists():
-            obj.delete()
+        if model.objects.remove(request.user, pk):
             return Response(status=status.HTTP_204_NO_CONTENT)
+        recipe = get_object_or_404(Recipe, id=pk)
         return Response(
             {f'ERR: {recipe.name} - already deleted'},
             status=status.HTTP_400_BAD_REQUEST
         )
 
     @action(
-        methods=['get'],
+        methods=['post', 'delete'],
+        detail=False,
+        url_path='favorite',
+        url_name='favorite-batch',
+        permission_classes=[IsAuthenticated]
+    )
+    def favorite_batch(self, request):
+        return self.add_del_batch(Favorite, request)
+
+    @action(
+        methods=['post', 'delete'],
         detail=False,
+        url_path='shopping_cart',
+        url_name='shopping-cart-batch',
         permission_classes=[IsAuthenticated]
     )
+    def shopping_cart_batch(self, request):
+        return self.add_del_batch(ShoppingCart, request)
+
+    def add_del_batch(self, model, request):
+        serializer = IdListSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+
+        if request.method == 'POST':
+            found = set(Recipe.objects.filter(
+                id__in=ids
+            ).values_list('id', flat=True))
+            added = model.objects.add_many(request.user, found)
+            return batch_results(
+                ids,
+                added,
+                found,
+                status.HTTP_201_CREATED,
+                'ERR: Already added'
+            )
+
+        removed = model.objects.remove_many(request.user, ids)
+        found = removed | set(Recipe.objects.filter(
+            id__in=set(ids) - removed
+        ).values_list('id', flat=True))
+        return batch_results(
+            ids,
+            removed,
+            found,
+            status.HTTP_204_NO_CONTENT,
+            'ERR: Already deleted'
+        )
+
+    @action(detail=False, permission_classes=[IsAuthenticated])
+    def feed(self, request):
+        paginator = FeedPagination()
+        ids = paginator.paginate_ids(
+            request,
+            partial(FeedEntry.objects.page, request.user.id)
+        )
+        recipes = self.get_queryset().in_bulk(ids)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in ids if pk in recipes],
+            many=True
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, permission_classes=[IsAuthenticated])
+    def recommended(self, request):
+        user = request.user
+        seeds = Favorite.objects.filter(user=user).order_by(
+            '-created'
+        ).values('recipe_id')[:settings.RECOMMENDATION_SEEDS]
+        scores = {}
+        for neighbor_id, score in RecipeNeighbor.objects.filter(
+            recipe_id__in=seeds
+        ).values_list('neighbor_id', 'score'):
+            scores[neighbor_id] = scores.get(neighbor_id, 0) + score
+        ranked = heapq.nlargest(
+            settings.RECOMMENDATION_LIMIT,
+            scores.items(),
+            key=lambda item: (item[1], item[0])
+        )
+        queryset = self.get_queryset().filter(
+            pk__in=[pk for pk, score in ranked]
+        ).exclude(
+            Exists(Favorite.objects.filter(user=user, recipe=OuterRef('pk')))
+        ).order_by(Case(
+            *[When(pk=pk, then=Value(rank))
+              for rank, (pk, score) in enumerate(ranked)],
+            output_field=IntegerField()
+        ))
+        paginator = LimitPageNumberPagination()
+        page = paginator.paginate_queryset(queryset, request, self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, url_path='what_can_i_cook')
+    def what_can_i_cook(self, request):
+        serializer = IngredientMatchSerializer(data={
+            'ingredients': request.query_params.getlist('ingredients')
+        })
+        serializer.is_valid(raise_exception=True)
+        queryset = self.filter_queryset(self.get_queryset())
+        candidates = None
+        if queryset.query.has_filters():
+            candidates = set(queryset.order_by().values_list('pk', flat=True))
+        paginator = LimitPageNumberPagination()
+        page = paginator.paginate_queryset(
+            coverage_index.match(
+                serializer.validated_data['ingredients'],
+                candidates
+            ),
+            request,
+            self
+        )
+        recipes = queryset.in_bulk([pk for pk, coverage in page])
+        page = [
+            (recipes[pk], coverage) for pk, coverage in page if pk in recipes
+        ]
+        serializer = self.get_serializer(
+            [recipe for recipe, coverage in page],
+            many=True
+        )
+        for item, (recipe, coverage) in zip(serializer.data, page):
+            item['coverage'] = coverage
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(
+        methods=['get'],
+        detail=False,
+        permission_classes=[IsAuthenticated],
+        content_negotiation_class=IgnoreFormatContentNegotiation
+    )
     def download_shopping_cart(self, request):
+        renderer = get_renderer(request.query_params.get('format'))
+        if renderer is None:
+            return Response(
+                {'ERR: Unknown shopping list format'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         if not request.user.shopping_cart.exists():
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
-        ingredients = IngredientInRecipe.objects.filter(
-            recipe__shopping_cart__user=request.user
-        ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(amount=Sum('amount'))
-
-        shopping_cart = ''
-        for i in ingredients:
-            shopping_cart += (
-                f'{i["ingredient__name"]} '
-                '\n'
-                f'{i["amount"]} '
-                f'{i["ingredient__measurement_unit"]} \n\n'
+        if renderer.streaming:
+            response = StreamingHttpResponse(
+                renderer.render(iter_cart_rows(request.user)),
+                content_type=renderer.content_type
             )
-        response = HttpResponse(shopping_cart, content_type='application/pdf')
+        else:
+            digest, rows = get_cart_digest(request.user)
+            etag = quote_etag(f'{renderer.format}-{digest}')
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                document = get_document(
+                    renderer,
+                    request.user,
+                    digest,
+                    rows
+                )
+                if isinstance(document, bytes):
+                    response = HttpResponse(
+                        document,
+                        content_type=renderer.content_type
+                    )
+                else:
+                    response = StreamingHttpResponse(
+                        document,
+                        content_type=renderer.content_type
+                    )
+            response['ETag'] = etag
         response['Content-Disposition'] = (
-            'attachment;'
-            'filename="shopping_cart.pdf"'
+            f'attachment; filename="{renderer.filename}"'
         )
-        p = canvas.Canvas(response)
-        pdfmetrics.registerFont(TTFont('DejaVuSerif', 'DejaVuSerif.ttf'))
-        p.setFont('DejaVuSerif', 10)
-        p.drawString(10, 800, shopping_cart)
-        p.showPage()
-        p.save()
         return response
 
 
@@ -165,15 +439,77 @@ class CustomUserViewSet(UserViewSet):
                 author=author
             )
             subscription.delete()
+            FeedEntry.objects.remove_authors(user.id, [author.id])
             return Response(status=status.HTTP_204_NO_CONTENT)
 
-    @action(detail=False)
-    def subscriptions(self, request):
+    @action(
+        methods=['post', 'delete'],
+        detail=False,
+        url_path='subscribe',
+        url_name='subscribe-batch',
+        permission_classes=[IsAuthenticated]
+    )
+    def subscribe_batch(self, request):
+        serializer = IdListSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
         user = request.user
-        queryset = User.objects.filter(subscribing__user=user)
+        subscriptions = Subscribe.objects.filter(user=user, author_id__in=ids)
+
+        if request.method == 'POST':
+            found = set(User.objects.filter(
+                id__in=ids
+            ).values_list('id', flat=True))
+            subscribed = set(subscriptions.values_list('author_id', flat=True))
+            added = found - subscribed - {user.id}
+            Subscribe.objects.bulk_create(
+                [Subscribe(user=user, author_id=pk) for pk in added],
+                ignore_conflicts=True
+            )
+            FeedEntry.objects.backfill(user.id, added)
+            return batch_results(
+                ids,
+                added,
+                found,
+                status.HTTP_201_CREATED,
+                'ERR: Already subscribed',
+                {user.id: 'ERR: Cannot subscribe at youself'}
+            )
+
+        removed = set(subscriptions.values_list('author_id', flat=True))
+        subscriptions.filter(author_id__in=removed).delete()
+        FeedEntry.objects.remove_authors(user.id, removed)
+        found = removed | set(User.objects.filter(
+            id__in=set(ids) - removed
+        ).values_list('id', flat=True))
+        return batch_results(
+            ids,
+            removed,
+            found,
+            status.HTTP_204_NO_CONTENT,
+            'ERR: Not subscribed'
+        )
+
+    def with_recipes(self, queryset):
+        recipes = Recipe.objects.all()
+        limit = get_recipes_limit(self.request)
+        if limit:
+            recipes = recipes[:limit]
+        return queryset.annotate(
+            recipes_count=Count('recipes')
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='limited_recipes')
+        )
+
+    @action(detail=False, permission_classes=[IsAuthenticated])
+    def subscriptions(self, request):
+        queryset = self.with_recipes(User.objects.filter(
+            subscribing__user=request.user
+        ).annotate(is_subscribed=Value(True))).order_by('-id')
+        page = self.paginate_queryset(queryset)
         serializer = SubscribeSerializer(
-            queryset,
+            page,
             many=True,
             context={'request': request}
         )
-        return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
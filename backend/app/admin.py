@@ -5,11 +5,15 @@ from .models import (
 
 
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'author', 'favorites_count')
+    list_display = (
+        'id',
+        'name',
+        'author',
+        'favorites_count',
+        'in_carts_count'
+    )
     list_filter = ('name', 'author', 'tags')
-
-    def favorites_count(self, obj):
-        return obj.favorites.count()
+    list_select_related = ('author',)
 
 
 class IngredientAdmin(admin.ModelAdmin):
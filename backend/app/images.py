@@ -0,0 +1,84 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, models, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def get_executor():
+    return ThreadPoolExecutor(
+        max_workers=settings.IMAGE_PROCESSING_WORKERS,
+        thread_name_prefix='renditions'
+    )
+
+
+def render(image, size):
+    image = image.copy()
+    image.thumbnail(size)
+    if settings.IMAGE_RENDITION_FORMAT == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, format=settings.IMAGE_RENDITION_FORMAT, quality=80)
+    return buffer.getvalue()
+
+
+def generate_renditions(recipe_id):
+    recipe = Recipe.objects.filter(pk=recipe_id).only('id', 'image').first()
+    if recipe is None or not recipe.image:
+        return
+    with recipe.image.open('rb') as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+
+    stem = os.path.splitext(os.path.basename(recipe.image.name))[0]
+    extension = settings.IMAGE_RENDITION_FORMAT.lower()
+    renditions = {}
+    for field, size in settings.IMAGE_RENDITIONS.items():
+        rendition = getattr(recipe, field)
+        rendition.save(
+            f'{stem}_{field}.{extension}',
+            ContentFile(render(image, size)),
+            save=False
+        )
+        renditions[field] = rendition.name
+    Recipe.objects.filter(
+        pk=recipe_id,
+        image=recipe.image.name
+    ).update(updated=timezone.now(), **renditions)
+
+
+def missing_renditions():
+    missing = models.Q()
+    for field in settings.IMAGE_RENDITIONS:
+        missing |= models.Q(**{f'{field}__isnull': True}) | models.Q(
+            **{field: ''}
+        )
+    return Recipe.objects.exclude(image='').filter(missing)
+
+
+def run_in_worker(recipe_id):
+    try:
+        generate_renditions(recipe_id)
+    except Exception:
+        logger.exception('Cannot render images of recipe %s', recipe_id)
+    finally:
+        connections.close_all()
+
+
+def schedule_renditions(recipe_id):
+    if settings.IMAGE_PROCESSING_BACKEND == 'sync':
+        task = partial(generate_renditions, recipe_id)
+    else:
+        task = partial(get_executor().submit, run_in_worker, recipe_id)
+    transaction.on_commit(task)
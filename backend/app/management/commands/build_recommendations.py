@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from app.models import Favorite, RecipeNeighbor, ShoppingCart
+from app.utils import build_recipe_neighbors
+
+
+class Command(BaseCommand):
+    help = 'Rebuild recipe neighbors from favorites and shopping carts'
+
+    def handle(self, *args, **options):
+        created = build_recipe_neighbors(
+            Favorite,
+            ShoppingCart,
+            RecipeNeighbor
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {created} recipe neighbors'
+        ))
@@ -0,0 +1,36 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from app.storage import find_orphans
+
+
+class Command(BaseCommand):
+    help = 'Delete media files that are not referenced by any record'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=24 * 60 * 60,
+            help='Keep unreferenced files younger than this many seconds'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only list the files that would be deleted'
+        )
+
+    def handle(self, *args, **options):
+        deleted = 0
+        size = 0
+        for name in find_orphans(options['grace']):
+            size += default_storage.size(name)
+            deleted += 1
+            if options['dry_run']:
+                self.stdout.write(name)
+            else:
+                default_storage.delete(name)
+        action = 'Found' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} {deleted} orphaned files ({size} bytes)'
+        ))
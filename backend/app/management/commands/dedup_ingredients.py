@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api import reference_data
+from api.shopping_list import invalidate_all
+from app.models import Ingredient, IngredientInRecipe
+from app.utils import merge_duplicate_ingredients
+
+
+class Command(BaseCommand):
+    help = 'Merge ingredients with the same name and measurement unit'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            merged = merge_duplicate_ingredients(
+                Ingredient,
+                IngredientInRecipe
+            )
+        reference_data.ingredients.bump()
+        invalidate_all()
+        self.stdout.write(self.style.SUCCESS(
+            f'Merged {merged} duplicate ingredients'
+        ))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from app.images import generate_renditions, missing_renditions
+
+
+class Command(BaseCommand):
+    help = 'Generate image renditions of recipes that have none'
+
+    def handle(self, *args, **options):
+        generated = 0
+        failed = 0
+        recipe_ids = list(missing_renditions().values_list('id', flat=True))
+        for recipe_id in recipe_ids:
+            try:
+                generate_renditions(recipe_id)
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f'ERR: Recipe {recipe_id}: {error}')
+            else:
+                generated += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated renditions of {generated} recipes, {failed} failed'
+        ))
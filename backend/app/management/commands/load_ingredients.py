@@ -0,0 +1,143 @@
+import csv
+import json
+import os
+import re
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api import reference_data
+from api.shopping_list import invalidate_all
+from app.models import Ingredient
+
+DEFAULT_PATH = os.path.join(
+    settings.BASE_DIR.parent,
+    'data',
+    'ingredients.csv'
+)
+CHUNK_SIZE = 64 * 1024
+SEPARATOR = re.compile(r'[\s,]*')
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield row[0].strip(), row[1].strip()
+
+
+def iter_json_array(file):
+    decoder = json.JSONDecoder()
+    buffer = file.read(CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('ERR: Expected a JSON array')
+    position = 1
+    while True:
+        position = SEPARATOR.match(buffer, position).end()
+        if buffer.startswith(']', position):
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = file.read(CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('ERR: Unexpected end of JSON file')
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item
+
+
+def read_json(file):
+    for item in iter_json_array(file):
+        yield item['name'].strip(), item['measurement_unit'].strip()
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
+
+
+def batched(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = 'Load ingredients from a CSV or JSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=DEFAULT_PATH)
+        parser.add_argument('--format', choices=tuple(READERS))
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--update',
+            action='store_true',
+            help='Update the measurement unit of ingredients that exist'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = (
+            options['format']
+            or os.path.splitext(path)[1].lstrip('.').lower()
+        )
+        if format not in READERS:
+            raise CommandError(f'ERR: Unknown file format {format}')
+
+        started = time.perf_counter()
+        total = created = updated = 0
+        with open(path, encoding='utf-8') as file, transaction.atomic():
+            rows = READERS[format](file)
+            for batch in batched(rows, options['batch_size']):
+                batch_created, batch_updated = self.load_batch(
+                    batch,
+                    options['update']
+                )
+                total += len(batch)
+                created += batch_created
+                updated += batch_updated
+        reference_data.ingredients.bump()
+        invalidate_all()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Read {total} rows, created {created}, updated {updated} '
+            f'in {elapsed:.2f}s ({total / elapsed:.0f} rows/s)'
+        ))
+
+    def load_batch(self, batch, update):
+        existing = {}
+        for ingredient in Ingredient.objects.filter(
+            name__in={name for name, _ in batch}
+        ):
+            existing.setdefault(ingredient.name, []).append(ingredient)
+
+        new = []
+        changed = {}
+        for name, unit in dict.fromkeys(batch):
+            known = existing.get(name, [])
+            if any(item.measurement_unit == unit for item in known):
+                continue
+            if update and len(known) == 1:
+                known[0].measurement_unit = unit
+                if known[0].pk is not None:
+                    changed[known[0].pk] = known[0]
+                continue
+            ingredient = Ingredient(name=name, measurement_unit=unit)
+            existing.setdefault(name, []).append(ingredient)
+            new.append(ingredient)
+
+        Ingredient.objects.bulk_create(new, ignore_conflicts=True)
+        Ingredient.objects.bulk_update(
+            changed.values(),
+            ['measurement_unit']
+        )
+        return len(new), len(changed)
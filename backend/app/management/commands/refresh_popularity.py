@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from app.models import Favorite, Recipe, RecipePopularity, ShoppingCart
+from app.utils import refresh_popularity
+
+
+class Command(BaseCommand):
+    help = 'Rebuild popular and trending scores of recipes'
+
+    def handle(self, *args, **options):
+        updated = refresh_popularity(
+            Recipe,
+            Favorite,
+            ShoppingCart,
+            RecipePopularity,
+            timezone.now()
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated popularity of {updated} recipes'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from app.models import Favorite, Recipe, ShoppingCart
+from app.utils import refresh_recipe_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute favorites and shopping cart counters of recipes'
+
+    def handle(self, *args, **options):
+        updated = refresh_recipe_counters(Recipe, Favorite, ShoppingCart)
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated counters of {updated} recipes'
+        ))
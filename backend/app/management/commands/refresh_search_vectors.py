@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from app.models import IngredientInRecipe, Recipe
+from app.utils import update_search_vectors
+
+
+class Command(BaseCommand):
+    help = 'Rebuild full-text search vectors of recipes'
+
+    def handle(self, *args, **options):
+        updated = update_search_vectors(
+            Recipe.objects.all(),
+            IngredientInRecipe
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated search vectors of {updated} recipes'
+        ))
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.models import FeedEntry
+
+
+class Command(BaseCommand):
+    help = 'Trim feed timelines to the newest FEED_TIMELINE_SIZE entries'
+
+    def handle(self, *args, **options):
+        trimmed = FeedEntry.objects.trim(settings.FEED_TIMELINE_SIZE)
+        self.stdout.write(self.style.SUCCESS(
+            f'Removed {trimmed} feed entries'
+        ))
@@ -0,0 +1,49 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    Ingredient = apps.get_model('app', 'Ingredient')
+    IngredientInRecipe = apps.get_model('app', 'IngredientInRecipe')
+    duplicates = Ingredient.objects.values(
+        'name',
+        'measurement_unit'
+    ).annotate(
+        keep_id=Min('id'),
+        total=Count('id')
+    ).filter(total__gt=1)
+
+    for group in duplicates.iterator():
+        duplicate_ids = list(Ingredient.objects.filter(
+            name=group['name'],
+            measurement_unit=group['measurement_unit']
+        ).exclude(id=group['keep_id']).values_list('id', flat=True))
+        kept = {
+            item.recipe_id: item
+            for item in IngredientInRecipe.objects.filter(
+                ingredient_id=group['keep_id']
+            )
+        }
+        for item in IngredientInRecipe.objects.filter(
+            ingredient_id__in=duplicate_ids
+        ):
+            if item.recipe_id in kept:
+                kept[item.recipe_id].amount += item.amount
+                kept[item.recipe_id].save(update_fields=['amount'])
+                item.delete()
+            else:
+                item.ingredient_id = group['keep_id']
+                item.save(update_fields=['ingredient'])
+                kept[item.recipe_id] = item
+        Ingredient.objects.filter(id__in=duplicate_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_ingredient_name_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.3 on 2026-10-18 03:16
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_ingredient_unique_name_unit'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='recipe',
+            options={'ordering': ('-id',)},
+        ),
+    ]
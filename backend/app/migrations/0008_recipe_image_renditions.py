@@ -0,0 +1,23 @@
+# Generated by Django 4.2.3 on 2026-10-18 03:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='card_image',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='recipe/renditions/'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='recipe/renditions/'),
+        ),
+    ]
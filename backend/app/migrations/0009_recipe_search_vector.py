@@ -0,0 +1,67 @@
+# Generated by Django 4.2.3 on 2026-10-18 03:25
+
+import django.contrib.postgres.search
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Coalesce
+
+SEARCH_CONFIG = 'russian'
+
+
+def fill_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Recipe = apps.get_model('app', 'Recipe')
+    IngredientInRecipe = apps.get_model('app', 'IngredientInRecipe')
+    ingredient_names = Subquery(
+        IngredientInRecipe.objects.filter(
+            recipe_id=OuterRef('pk')
+        ).values('recipe_id').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names'),
+        output_field=TextField()
+    )
+    Recipe.objects.using(schema_editor.connection.alias).update(
+        search_vector=(
+            SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector(
+                Coalesce(
+                    ingredient_names,
+                    Value(''),
+                    output_field=TextField()
+                ),
+                weight='B',
+                config=SEARCH_CONFIG
+            )
+            + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+        )
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS app_recipe_search_vector_idx '
+        'ON app_recipe USING gin (search_vector)'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'DROP INDEX IF EXISTS app_recipe_search_vector_idx'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_recipe_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_search_vectors, drop_search_index),
+    ]
@@ -1,13 +1,73 @@
-from django.db import models
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.db import connections, models
 from django.core.validators import (
     RegexValidator,
     MaxValueValidator,
     MinValueValidator
 )
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models.functions import Greatest, RowNumber
+from django.utils import timezone
+from django.dispatch import Signal
+
+from users.models import Subscribe
 
 User = get_user_model()
 
+MAX_AMOUNT = 10000
+
+user_recipes_changed = Signal()
+
+
+class RecipeQuerySet(models.QuerySet):
+    def related_lookups(self):
+        return (
+            models.Prefetch('tags', queryset=Tag.objects.all()),
+            models.Prefetch(
+                'ingredients_list',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient'
+                )
+            ),
+        )
+
+    def with_related(self):
+        return self.select_related('author').prefetch_related(
+            *self.related_lookups()
+        )
+
+    def with_user_flags(self, user):
+        if user.is_anonymous:
+            return self.annotate(
+                is_favorited=models.Value(False),
+                is_in_shopping_cart=models.Value(False),
+                author_is_subscribed=models.Value(False),
+            )
+        return self.annotate(
+            is_favorited=models.Exists(Favorite.objects.filter(
+                user=user, recipe=models.OuterRef('pk')
+            )),
+            is_in_shopping_cart=models.Exists(ShoppingCart.objects.filter(
+                user=user, recipe=models.OuterRef('pk')
+            )),
+            author_is_subscribed=models.Exists(Subscribe.objects.filter(
+                user=user, author=models.OuterRef('author')
+            )),
+        )
+
+    def for_read(self, user):
+        return self.select_related('author').with_user_flags(user)
+
+    def touch(self):
+        return self.update(updated=timezone.now())
+
+    def adjust_counter(self, field, delta):
+        return self.update(**{field: Greatest(models.F(field) + delta, 0)})
+
 
 class Recipe(models.Model):
     author = models.ForeignKey(
@@ -31,10 +91,58 @@ class Recipe(models.Model):
         default=1,
         validators=[MinValueValidator(1), MaxValueValidator(1000)]
     )
+    thumbnail = models.ImageField(
+        upload_to='recipe/renditions/',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    card_image = models.ImageField(
+        upload_to='recipe/renditions/',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    favorites_count = models.PositiveIntegerField(default=0, editable=False)
+    in_carts_count = models.PositiveIntegerField(default=0, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+    fanned_out = models.BooleanField(default=False, editable=False)
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = RecipeQuerySet.as_manager()
+
+    DERIVED_FIELDS = (
+        'thumbnail',
+        'card_image',
+        'favorites_count',
+        'in_carts_count',
+        'search_vector',
+        'fanned_out',
+    )
+
+    class Meta:
+        ordering = ('-id',)
+        indexes = [
+            models.Index(
+                fields=['author', '-id'],
+                condition=models.Q(fanned_out=False),
+                name='recipe_pulled_feed_idx'
+            )
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.DERIVED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class Tag(models.Model):
     name = models.CharField(unique=True, max_length=20)
@@ -58,6 +166,14 @@ class Ingredient(models.Model):
     name = models.CharField(max_length=200)
     measurement_unit = models.CharField(max_length=20)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient'
+            )
+        ]
+
     def __str__(self):
         return f'{self.name}, {self.measurement_unit}'
 
@@ -73,7 +189,7 @@ class IngredientInRecipe(models.Model):
         on_delete=models.CASCADE
     )
     amount = models.PositiveSmallIntegerField(
-        validators=[MinValueValidator(1), MaxValueValidator(10000)]
+        validators=[MinValueValidator(1), MaxValueValidator(MAX_AMOUNT)]
     )
 
     def __str__(self):
@@ -83,6 +199,78 @@ class IngredientInRecipe(models.Model):
         )
 
 
+class UserRecipeQuerySet(models.QuerySet):
+    def get_columns(self):
+        opts = self.model._meta
+        quote_name = connections[self.db].ops.quote_name
+        return (
+            quote_name(opts.db_table),
+            quote_name(opts.get_field('user').column),
+            quote_name(opts.get_field('recipe').column),
+            quote_name(opts.get_field('created').column),
+        )
+
+    def execute_returning(self, sql, params):
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            return {row[0] for row in cursor.fetchall()}
+
+    def add_many(self, user, recipe_ids):
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return set()
+        table, user_column, recipe_column, created_column = (
+            self.get_columns()
+        )
+        created = connections[self.db].ops.adapt_datetimefield_value(
+            timezone.now()
+        )
+        added = self.execute_returning(
+            f'INSERT INTO {table} '
+            f'({user_column}, {recipe_column}, {created_column}) '
+            f'VALUES {", ".join(["(%s, %s, %s)"] * len(recipe_ids))} '
+            f'ON CONFLICT DO NOTHING RETURNING {recipe_column}',
+            [
+                value for pk in recipe_ids
+                for value in (user.pk, pk, created)
+            ]
+        )
+        if added:
+            user_recipes_changed.send(
+                sender=self.model,
+                user_id=user.pk,
+                recipe_ids=added,
+                delta=1
+            )
+        return added
+
+    def remove_many(self, user, recipe_ids):
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return set()
+        table, user_column, recipe_column, _ = self.get_columns()
+        removed = self.execute_returning(
+            f'DELETE FROM {table} WHERE {user_column} = %s '
+            f'AND {recipe_column} IN ({", ".join(["%s"] * len(recipe_ids))}) '
+            f'RETURNING {recipe_column}',
+            [user.pk, *recipe_ids]
+        )
+        if removed:
+            user_recipes_changed.send(
+                sender=self.model,
+                user_id=user.pk,
+                recipe_ids=removed,
+                delta=-1
+            )
+        return removed
+
+    def add(self, user, recipe):
+        return bool(self.add_many(user, [recipe.pk]))
+
+    def remove(self, user, recipe_id):
+        return bool(self.remove_many(user, [recipe_id]))
+
+
 class Favorite(models.Model):
     user = models.ForeignKey(
         User,
@@ -94,6 +282,11 @@ class Favorite(models.Model):
         on_delete=models.CASCADE,
         related_name='favorites',
     )
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    counter_field = 'favorites_count'
+
+    objects = UserRecipeQuerySet.as_manager()
 
     class Meta:
         constraints = [
@@ -118,6 +311,11 @@ class ShoppingCart(models.Model):
         on_delete=models.CASCADE,
         related_name='shopping_cart',
     )
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    counter_field = 'in_carts_count'
+
+    objects = UserRecipeQuerySet.as_manager()
 
     class Meta:
         constraints = [
@@ -129,3 +327,163 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.user} - {self.recipe.name}'
+
+
+class FeedEntryQuerySet(models.QuerySet):
+    def execute(self, sql, params):
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+
+    def fan_out(self, recipe):
+        limit = settings.FEED_FANOUT_LIMIT
+        followers = Subscribe.objects.filter(author_id=recipe.author_id)
+        if followers.values('pk')[:limit + 1].count() > limit:
+            return 0
+        quote_name = connections[self.db].ops.quote_name
+        opts = self.model._meta
+        subscribe_opts = Subscribe._meta
+        pushed = self.execute(
+            f'INSERT INTO {quote_name(opts.db_table)} '
+            f'({quote_name(opts.get_field("user").column)}, '
+            f'{quote_name(opts.get_field("recipe").column)}) '
+            f'SELECT {quote_name(subscribe_opts.get_field("user").column)}, '
+            f'%s FROM {quote_name(subscribe_opts.db_table)} '
+            f'WHERE {quote_name(subscribe_opts.get_field("author").column)} '
+            f'= %s ON CONFLICT DO NOTHING',
+            [recipe.pk, recipe.author_id]
+        )
+        Recipe.objects.filter(pk=recipe.pk).update(fanned_out=True)
+        return pushed
+
+    def backfill(self, user_id, author_ids):
+        recipe_ids = Recipe.objects.filter(
+            author_id__in=author_ids,
+            fanned_out=True
+        ).annotate(rank=models.Window(
+            RowNumber(),
+            partition_by=models.F('author_id'),
+            order_by=models.F('id').desc()
+        )).filter(
+            rank__lte=settings.FEED_BACKFILL_SIZE
+        ).values_list('id', flat=True)
+        entries = self.bulk_create(
+            [self.model(user_id=user_id, recipe_id=pk) for pk in recipe_ids],
+            ignore_conflicts=True
+        )
+        return len(entries)
+
+    def page(self, user_id, before, limit):
+        timeline = self.filter(user_id=user_id)
+        pulled = Recipe.objects.filter(fanned_out=False)
+        if before is not None:
+            timeline = timeline.filter(recipe_id__lt=before)
+            pulled = pulled.filter(id__lt=before)
+        sources = [list(timeline.order_by('-recipe_id').values_list(
+            'recipe_id',
+            flat=True
+        )[:limit])]
+        authors = Subscribe.objects.filter(user_id=user_id).filter(
+            models.Exists(pulled.filter(
+                author_id=models.OuterRef('author_id')
+            ))
+        )
+        for author_id in authors.values_list('author_id', flat=True):
+            sources.append(list(pulled.filter(author_id=author_id).order_by(
+                '-id'
+            ).values_list('id', flat=True)[:limit]))
+        return list(islice(heapq.merge(*sources, reverse=True), limit))
+
+    def trim(self, size, batch_size=10000):
+        ids = self.annotate(rank=models.Window(
+            RowNumber(),
+            partition_by=models.F('user_id'),
+            order_by=models.F('recipe_id').desc()
+        )).filter(rank__gt=size).values_list('id', flat=True)
+        ids = list(ids)
+        trimmed = 0
+        for start in range(0, len(ids), batch_size):
+            trimmed += self.model.objects.filter(
+                id__in=ids[start:start + batch_size]
+            ).delete()[0]
+        return trimmed
+
+    def remove_authors(self, user_id, author_ids):
+        return self.filter(
+            user_id=user_id,
+            recipe__author_id__in=author_ids
+        ).delete()[0]
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+
+    objects = FeedEntryQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_entry'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user} - {self.recipe.name}'
+
+
+class RecipePopularity(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='popularity',
+    )
+    popular = models.FloatField(default=0, db_index=True)
+    trending = models.FloatField(default=0, db_index=True)
+    updated = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.popular} / {self.trending}'
+
+
+class RecipeNeighbor(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='neighbors',
+    )
+    neighbor = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'neighbor'],
+                name='unique_recipe_neighbor'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id} - {self.neighbor_id}: {self.score}'
+
+
+class RecipeChange(models.Model):
+    recipe_id = models.BigIntegerField()
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f'{self.id}: {self.recipe_id}'
@@ -0,0 +1,112 @@
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete
+)
+from django.dispatch import receiver
+
+from users.models import Subscribe, User
+from .models import (
+    Favorite,
+    FeedEntry,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    user_recipes_changed
+)
+from .utils import update_search_vectors
+
+
+def deleted_with(origin, model):
+    if isinstance(origin, QuerySet):
+        return origin.model is model
+    return isinstance(origin, model)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def increment_recipe_counter(sender, instance, created, **kwargs):
+    if created:
+        Recipe.objects.filter(pk=instance.recipe_id).adjust_counter(
+            sender.counter_field,
+            1
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def decrement_recipe_counter(sender, instance, origin=None, **kwargs):
+    if deleted_with(origin, Recipe) or deleted_with(origin, User):
+        return
+    Recipe.objects.filter(pk=instance.recipe_id).adjust_counter(
+        sender.counter_field,
+        -1
+    )
+
+
+@receiver(pre_delete, sender=User)
+def decrement_user_recipe_counters(sender, instance, **kwargs):
+    for model in (Favorite, ShoppingCart):
+        Recipe.objects.filter(pk__in=model.objects.filter(
+            user=instance
+        ).values('recipe_id')).adjust_counter(model.counter_field, -1)
+
+
+@receiver(user_recipes_changed)
+def adjust_recipe_counters(sender, recipe_ids, delta, **kwargs):
+    Recipe.objects.filter(pk__in=recipe_ids).adjust_counter(
+        sender.counter_field,
+        delta
+    )
+
+
+def schedule_search_vectors(recipes):
+    transaction.on_commit(
+        lambda: update_search_vectors(recipes, IngredientInRecipe)
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(sender, instance, **kwargs):
+    schedule_search_vectors(Recipe.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+def update_ingredient_in_recipe_search_vector(sender, instance, **kwargs):
+    schedule_search_vectors(Recipe.objects.filter(pk=instance.recipe_id))
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_search_vectors(sender, instance, created, **kwargs):
+    if not created:
+        schedule_search_vectors(Recipe.objects.filter(
+            ingredients_list__ingredient=instance
+        ))
+
+
+@receiver(post_save, sender=Subscribe)
+def backfill_feed(sender, instance, created, **kwargs):
+    if created:
+        FeedEntry.objects.backfill(instance.user_id, [instance.author_id])
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+def touch_recipe(sender, instance, **kwargs):
+    Recipe.objects.filter(pk=instance.recipe_id).touch()
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def touch_recipe_relations(sender, instance, action, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if isinstance(instance, Recipe):
+        Recipe.objects.filter(pk=instance.pk).touch()
+    elif pk_set:
+        Recipe.objects.filter(pk__in=pk_set).touch()
@@ -0,0 +1,87 @@
+import hashlib
+import os
+from collections import Counter
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import models
+from django.utils import timezone
+
+
+class HashedFileSystemStorage(FileSystemStorage):
+    def get_hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.get_hashed_name(name, content)
+        if self.exists(name):
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length=max_length)
+
+
+def get_file_fields(storage=default_storage):
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField) and (
+                field.storage is storage
+            ):
+                yield model, field
+
+
+def get_references(storage=default_storage):
+    references = Counter()
+    for model, field in get_file_fields(storage):
+        references.update(
+            model._default_manager.exclude(
+                **{f'{field.attname}__isnull': True}
+            ).exclude(
+                **{field.attname: ''}
+            ).values_list(field.attname, flat=True).iterator()
+        )
+    return references
+
+
+def is_referenced(name, storage=default_storage):
+    return any(
+        model._default_manager.filter(**{field.attname: name}).exists()
+        for model, field in get_file_fields(storage)
+    )
+
+
+def iter_files(storage, directory):
+    directories, files = storage.listdir(directory)
+    for name in files:
+        yield os.path.join(directory, name)
+    for name in directories:
+        yield from iter_files(storage, os.path.join(directory, name))
+
+
+def find_orphans(grace, storage=default_storage):
+    references = get_references(storage)
+    directories = {
+        field.upload_to for model, field in get_file_fields(storage)
+        if isinstance(field.upload_to, str)
+    }
+    threshold = timezone.now() - timedelta(seconds=grace)
+    for directory in sorted(directories):
+        if not storage.exists(directory):
+            continue
+        for name in iter_files(storage, directory):
+            if name in references or is_referenced(name, storage):
+                continue
+            if storage.get_modified_time(name) < threshold:
+                yield name
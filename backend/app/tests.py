@@ -0,0 +1,190 @@
+import os
+import shutil
+import tempfile
+from collections import Counter
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+
+from users.models import User
+from .models import Favorite, Ingredient, Recipe, ShoppingCart
+from .storage import find_orphans
+
+
+@skipUnless(connection.vendor == 'postgresql', 'PostgreSQL query plans')
+class IngredientIndexTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create([
+            Ingredient(name=f'ингредиент {i}', measurement_unit='г')
+            for i in range(200)
+        ])
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET enable_seqscan = off')
+
+    def tearDown(self):
+        with connection.cursor() as cursor:
+            cursor.execute('RESET enable_seqscan')
+
+    def assertUsesIndex(self, queryset, index):
+        self.assertIn(index, queryset.explain())
+
+    def test_name_and_unit_lookup(self):
+        self.assertUsesIndex(
+            Ingredient.objects.filter(
+                name='ингредиент 1',
+                measurement_unit='г'
+            ),
+            'unique_ingredient'
+        )
+
+    def test_name_prefix_lookup(self):
+        self.assertUsesIndex(
+            Ingredient.objects.filter(name__istartswith='ингр'),
+            'app_ingredient_name_prefix_idx'
+        )
+
+    def test_name_substring_lookup(self):
+        self.assertUsesIndex(
+            Ingredient.objects.filter(name__icontains='диент'),
+            'app_ingredient_name_trgm_idx'
+        )
+
+
+class RecipeCounterTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            email='author@test.ru',
+            username='author'
+        )
+        cls.users = User.objects.bulk_create([
+            User(email=f'user{i}@test.ru', username=f'user{i}')
+            for i in range(30)
+        ])
+        cls.recipes = Recipe.objects.bulk_create([
+            Recipe(author=cls.author, name=f'recipe{i}', text='text',
+                   cooking_time=1, favorites_count=30, in_carts_count=30)
+            for i in range(3)
+        ])
+        for model in (Favorite, ShoppingCart):
+            model.objects.bulk_create([
+                model(user=user, recipe=recipe)
+                for user in cls.users
+                for recipe in cls.recipes
+            ])
+
+    def delete(self, instance):
+        with CaptureQueriesContext(connection) as context:
+            instance.delete()
+        return [query['sql'] for query in context]
+
+    def count_delete_queries(self, instance):
+        return len(self.delete(instance))
+
+    def test_recipe_delete_skips_counter_updates(self):
+        queries = self.count_delete_queries(self.recipes[0])
+        Favorite.objects.filter(user__in=self.users[10:]).delete()
+        ShoppingCart.objects.filter(user__in=self.users[10:]).delete()
+        self.assertEqual(
+            self.count_delete_queries(self.recipes[1]),
+            queries
+        )
+
+    def test_user_delete_decrements_counters_once(self):
+        updates = [
+            sql for sql in self.delete(self.users[0])
+            if sql.startswith('UPDATE "app_recipe"')
+        ]
+        self.assertEqual(len(updates), 2)
+        for recipe in Recipe.objects.all():
+            self.assertEqual(recipe.favorites_count, 29)
+            self.assertEqual(recipe.in_carts_count, 29)
+
+    def test_single_delete_decrements_counter(self):
+        Favorite.objects.get(
+            user=self.users[0],
+            recipe=self.recipes[0]
+        ).delete()
+        self.assertEqual(
+            Recipe.objects.get(pk=self.recipes[0].pk).favorites_count,
+            29
+        )
+
+
+class TempMediaMixin:
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        media = self.settings(MEDIA_ROOT=directory)
+        media.enable()
+        self.addCleanup(media.disable)
+
+
+class HashedStorageTest(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.name = default_storage.save(
+            'recipe/images/image.png',
+            ContentFile(b'image')
+        )
+        os.utime(default_storage.path(self.name), (0, 0))
+
+    def test_saving_existing_file_refreshes_modified_time(self):
+        name = default_storage.save(
+            'recipe/images/copy.png',
+            ContentFile(b'image')
+        )
+        self.assertEqual(name, self.name)
+        self.assertEqual(list(find_orphans(60)), [])
+
+    def test_orphans_recheck_references(self):
+        self.assertEqual(list(find_orphans(60)), [self.name])
+        author = User.objects.create(email='author@test.ru', username='a')
+        Recipe.objects.create(author=author, name='recipe', text='text',
+                              cooking_time=1, image=self.name)
+        with mock.patch('app.storage.get_references', return_value=Counter()):
+            self.assertEqual(list(find_orphans(60)), [])
+
+
+class GenerateRenditionsTest(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        buffer = BytesIO()
+        Image.new('RGB', (800, 600)).save(buffer, format='PNG')
+        author = User.objects.create(email='author@test.ru', username='a')
+        self.recipes = [
+            Recipe.objects.create(
+                author=author,
+                name=name,
+                text='text',
+                cooking_time=1,
+                image=default_storage.save(
+                    f'recipe/images/{name}.png',
+                    ContentFile(content)
+                )
+            )
+            for name, content in (
+                ('image', buffer.getvalue()),
+                ('broken', b'broken')
+            )
+        ]
+        Recipe.objects.create(author=author, name='empty', text='text',
+                              cooking_time=1)
+
+    def test_generates_missing_renditions(self):
+        stdout = StringIO()
+        call_command('generate_renditions', stdout=stdout, stderr=StringIO())
+        self.assertIn('of 1 recipes, 1 failed', stdout.getvalue())
+        recipe = Recipe.objects.get(pk=self.recipes[0].pk)
+        self.assertEqual(recipe.thumbnail.width, 240)
+        self.assertEqual(recipe.card_image.width, 640)
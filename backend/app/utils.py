@@ -0,0 +1,186 @@
+import heapq
+import math
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import connections, transaction
+from django.db.models import (
+    Count,
+    IntegerField,
+    Min,
+    OuterRef,
+    Subquery,
+    TextField,
+    Value
+)
+from django.db.models.functions import Coalesce, TruncHour
+
+
+def merge_duplicate_ingredients(ingredient_model, ingredient_in_recipe_model):
+    duplicates = ingredient_model.objects.values(
+        'name',
+        'measurement_unit'
+    ).annotate(
+        keep_id=Min('id'),
+        total=Count('id')
+    ).filter(total__gt=1)
+
+    merged = 0
+    for group in duplicates.iterator():
+        duplicate_ids = list(ingredient_model.objects.filter(
+            name=group['name'],
+            measurement_unit=group['measurement_unit']
+        ).exclude(id=group['keep_id']).values_list('id', flat=True))
+        kept = {
+            item.recipe_id: item
+            for item in ingredient_in_recipe_model.objects.filter(
+                ingredient_id=group['keep_id']
+            )
+        }
+        for item in ingredient_in_recipe_model.objects.filter(
+            ingredient_id__in=duplicate_ids
+        ):
+            if item.recipe_id in kept:
+                kept[item.recipe_id].amount += item.amount
+                kept[item.recipe_id].save(update_fields=['amount'])
+                item.delete()
+            else:
+                item.ingredient_id = group['keep_id']
+                item.save(update_fields=['ingredient'])
+                kept[item.recipe_id] = item
+        ingredient_model.objects.filter(id__in=duplicate_ids).delete()
+        merged += len(duplicate_ids)
+    return merged
+
+
+def count_subquery(model):
+    return Coalesce(Subquery(
+        model.objects.filter(recipe_id=OuterRef('pk')).values(
+            'recipe_id'
+        ).annotate(total=Count('pk')).values('total'),
+        output_field=IntegerField()
+    ), 0)
+
+
+def refresh_recipe_counters(recipe_model, favorite_model, shopping_cart_model):
+    return recipe_model.objects.update(
+        favorites_count=count_subquery(favorite_model),
+        in_carts_count=count_subquery(shopping_cart_model),
+    )
+
+
+def update_search_vectors(recipes, ingredient_in_recipe_model):
+    if connections[recipes.db].vendor != 'postgresql':
+        return 0
+    config = settings.RECIPE_SEARCH_CONFIG
+    ingredient_names = Subquery(
+        ingredient_in_recipe_model.objects.filter(
+            recipe_id=OuterRef('pk')
+        ).values('recipe_id').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names'),
+        output_field=TextField()
+    )
+    return recipes.update(search_vector=(
+        SearchVector('name', weight='A', config=config)
+        + SearchVector(
+            Coalesce(ingredient_names, Value(''), output_field=TextField()),
+            weight='B',
+            config=config
+        )
+        + SearchVector('text', weight='C', config=config)
+    ))
+
+
+def refresh_popularity(
+    recipe_model,
+    favorite_model,
+    shopping_cart_model,
+    popularity_model,
+    now
+):
+    half_life = timedelta(hours=settings.POPULARITY_HALF_LIFE_HOURS)
+    since = now - timedelta(days=settings.POPULARITY_WINDOW_DAYS)
+    trending = defaultdict(float)
+    for model in (favorite_model, shopping_cart_model):
+        for row in model.objects.filter(created__gte=since).values(
+            'recipe_id',
+            hour=TruncHour('created')
+        ).annotate(total=Count('pk')).values_list(
+            'recipe_id',
+            'hour',
+            'total'
+        ).iterator():
+            recipe_id, hour, total = row
+            trending[recipe_id] += total * 0.5 ** ((now - hour) / half_life)
+
+    entries = [
+        popularity_model(
+            recipe_id=recipe_id,
+            popular=favorites_count + in_carts_count,
+            trending=trending.get(recipe_id, 0),
+            updated=now
+        )
+        for recipe_id, favorites_count, in_carts_count in
+        recipe_model.objects.exclude(
+            favorites_count=0,
+            in_carts_count=0
+        ).values_list('pk', 'favorites_count', 'in_carts_count').iterator()
+    ]
+    with transaction.atomic():
+        popularity_model.objects.all().delete()
+        popularity_model.objects.bulk_create(entries, batch_size=1000)
+    return len(entries)
+
+
+def build_recipe_neighbors(
+    favorite_model,
+    shopping_cart_model,
+    neighbor_model
+):
+    limit = settings.RECOMMENDATION_USER_ITEMS
+    items = defaultdict(set)
+    for model in (favorite_model, shopping_cart_model):
+        for user_id, recipe_id in model.objects.order_by(
+            'user_id',
+            '-created'
+        ).values_list('user_id', 'recipe_id').iterator():
+            if len(items[user_id]) < limit:
+                items[user_id].add(recipe_id)
+
+    counts = Counter()
+    pairs = defaultdict(Counter)
+    for recipe_ids in items.values():
+        recipe_ids = sorted(recipe_ids)
+        counts.update(recipe_ids)
+        for position, recipe_id in enumerate(recipe_ids):
+            pairs[recipe_id].update(recipe_ids[position + 1:])
+
+    neighbors = defaultdict(list)
+    for recipe_id, row in pairs.items():
+        for neighbor_id, together in row.items():
+            score = together / math.sqrt(
+                counts[recipe_id] * counts[neighbor_id]
+            )
+            neighbors[recipe_id].append((score, neighbor_id))
+            neighbors[neighbor_id].append((score, recipe_id))
+
+    entries = [
+        neighbor_model(
+            recipe_id=recipe_id,
+            neighbor_id=neighbor_id,
+            score=score
+        )
+        for recipe_id, row in neighbors.items()
+        for score, neighbor_id in heapq.nlargest(
+            settings.RECOMMENDATION_NEIGHBORS,
+            row
+        )
+    ]
+    with transaction.atomic():
+        neighbor_model.objects.all().delete()
+        neighbor_model.objects.bulk_create(entries, batch_size=1000)
+    return len(entries)
@@ -114,8 +114,90 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'app.storage.HashedFileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'foodgram'),
+    },
+    'files': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv(
+            'FILE_CACHE_LOCATION',
+            os.path.join(BASE_DIR, 'cache')
+        ),
+    },
+}
+
+SHOPPING_LIST_CACHE = os.getenv('SHOPPING_LIST_CACHE', 'files')
+
+SHOPPING_LIST_CACHE_TIMEOUT = 60 * 60 * 24
+
+SHOPPING_LIST_CACHE_MAX_SIZE = 1024 * 1024
+
+INGREDIENT_SEARCH_LIMIT = 20
+
+REFERENCE_DATA_CACHE = os.getenv('REFERENCE_DATA_CACHE', 'files')
+
+RECIPE_SEARCH_CONFIG = 'russian'
+
+RECIPE_SEARCH_LIMIT = 1000
+
+SEARCH_INDEX_CACHE = os.getenv('SEARCH_INDEX_CACHE', 'files')
+
+FEED_FANOUT_LIMIT = 10000
+
+FEED_BACKFILL_SIZE = 50
+
+FEED_TIMELINE_SIZE = 1000
+
+POPULARITY_HALF_LIFE_HOURS = 48
+
+POPULARITY_WINDOW_DAYS = 14
+
+RECOMMENDATION_NEIGHBORS = 20
+
+RECOMMENDATION_SEEDS = 20
+
+RECOMMENDATION_USER_ITEMS = 200
+
+RECOMMENDATION_LIMIT = 100
+
+RECIPE_REPRESENTATION_CACHE = os.getenv(
+    'RECIPE_REPRESENTATION_CACHE',
+    'default'
+)
+
+RECIPE_REPRESENTATION_TIMEOUT = 24 * 60 * 60
+
+RECIPE_REPRESENTATION_LOCAL_SIZE = 1000
+
+IMAGE_MAX_UPLOAD_SIZE = 5 * 1024 * 1024
+
+IMAGE_RENDITIONS = {
+    'thumbnail': (240, 240),
+    'card_image': (640, 640),
+}
+
+IMAGE_RENDITION_FORMAT = 'WEBP'
+
+IMAGE_PROCESSING_BACKEND = os.getenv('IMAGE_PROCESSING_BACKEND', 'thread')
+
+IMAGE_PROCESSING_WORKERS = 2
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         # 'rest_framework.authentication.SessionAuthentication',
@@ -123,6 +205,6 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.BasicAuthentication',
 
     ),
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.LimitPagination',
     'PAGE_SIZE': 10,
 }
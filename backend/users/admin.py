@@ -1,6 +1,9 @@
+from collections import defaultdict
+
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 
+from app.models import FeedEntry
 from .models import Subscribe, User
 
 
@@ -18,6 +21,18 @@ class UserAdmin(UserAdmin):
 class SubscribeAdmin(admin.ModelAdmin):
     list_display = ('user', 'author',)
 
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        FeedEntry.objects.remove_authors(obj.user_id, [obj.author_id])
+
+    def delete_queryset(self, request, queryset):
+        authors = defaultdict(list)
+        for user_id, author_id in queryset.values_list('user_id', 'author_id'):
+            authors[user_id].append(author_id)
+        super().delete_queryset(request, queryset)
+        for user_id, author_ids in authors.items():
+            FeedEntry.objects.remove_authors(user_id, author_ids)
+
 
 admin.site.register(User, UserAdmin)
 admin.site.register(Subscribe, SubscribeAdmin)